@@ -0,0 +1,706 @@
+import os
+import io
+import csv
+import json
+import time
+import shlex
+import bisect
+import shutil
+import sqlite3
+import hashlib
+import logging
+import itertools
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Backend penyimpanan airdrop yang dipakai bersama oleh edit.py dan off.py.
+# Konfigurasi dibaca dari env saat modul diimport, jadi .env dimuat di sini juga.
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Kolom record dasar; bot dengan kolom tambahan cukup membuat subclass dan
+# mengganti atribut `columns` (dan `derived_columns` untuk SQLite)
+COLUMNS = ['Nama', 'Twitter', 'Discord', 'Telegram', 'Link', 'Type']
+# Journal backend CSV: fsync tiap N operasi atau paling lambat tiap interval,
+# dipadatkan ke snapshot CSV setelah jumlah operasi melewati threshold
+JOURNAL_FSYNC_BATCH = int(os.getenv('JOURNAL_FSYNC_BATCH', '32'))
+JOURNAL_FSYNC_INTERVAL = float(os.getenv('JOURNAL_FSYNC_INTERVAL', '1.0'))
+JOURNAL_COMPACT_THRESHOLD = int(os.getenv('JOURNAL_COMPACT_THRESHOLD', '1000'))
+
+# Pencarian: trigram dari semua kolom, hasil diurutkan berdasarkan kemiripan
+# (substring persis = 1.0) dikali bobot kolom, sehingga salah ketik kecil
+# tetap ketemu. Keyword < 3 huruf memakai pencarian substring biasa.
+SEARCH_WEIGHTS = {'Nama': 3, 'Type': 2, 'Twitter': 1, 'Discord': 1, 'Telegram': 1, 'Link': 1}
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', '20'))
+SEARCH_CANDIDATES = 200
+SEARCH_MIN_SIMILARITY = 0.34
+
+def trigrams(text):
+    text = f" {' '.join(text.lower().split())} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def rank_matches(keyword, candidates):
+    # candidates: iterable (id, record); mengembalikan maksimal SEARCH_LIMIT hasil terbaik
+    query = trigrams(keyword)
+    ranked = []
+    for record_id, record in candidates:
+        score = 0.0
+        for col, weight in SEARCH_WEIGHTS.items():
+            value = record[col].lower()
+            if keyword in value:
+                similarity = 1.0
+            else:
+                similarity = len(query & trigrams(value)) / len(query)
+            if similarity >= SEARCH_MIN_SIMILARITY:
+                score = max(score, similarity * weight)
+        if score:
+            ranked.append((score, record_id, record))
+    ranked.sort(key=lambda r: (-r[0], r[1]))
+    return [(record_id, record) for _, record_id, record in ranked[:SEARCH_LIMIT]]
+
+class TrigramIndex:
+    # Inverted index trigram -> set row id internal untuk backend CSV. Row id
+    # tidak bergeser saat record lain dihapus, jadi index cukup diperbarui
+    # untuk record yang berubah.
+    def __init__(self):
+        self.postings = {}
+
+    def _grams(self, record):
+        grams = set()
+        for col in SEARCH_WEIGHTS:
+            grams |= trigrams(record[col])
+        return grams
+
+    def add(self, record_id, record):
+        for gram in self._grams(record):
+            self.postings.setdefault(gram, set()).add(record_id)
+
+    def remove(self, record_id, record):
+        for gram in self._grams(record):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def rebuild(self, rows):
+        # rows: iterable (row id, record)
+        self.postings = {}
+        for row_id, record in rows:
+            self.add(row_id, record)
+
+    def candidates(self, keyword, limit=SEARCH_CANDIDATES):
+        counts = {}
+        for gram in trigrams(keyword):
+            for record_id in self.postings.get(gram, ()):
+                counts[record_id] = counts.get(record_id, 0) + 1
+        return sorted(counts, key=counts.get, reverse=True)[:limit]
+
+# Filter /list, contoh: /list type:Testnet has:discord sort:nama limit:20
+AIRDROP_TYPES = ['Galxe', 'Testnet', 'Layer3', 'Waitlist', 'Node', 'Social Task']
+LINK_COLUMNS = {'twitter': 'Twitter', 'discord': 'Discord', 'telegram': 'Telegram', 'link': 'Link'}
+SORT_COLUMNS = {'id': None, 'nama': 'Nama', 'type': 'Type'}
+
+def parse_list_query(text):
+    filters = {'type': None, 'has': [], 'sort': 'id', 'limit': None}
+    for token in shlex.split(text):
+        key, _, value = token.partition(':')
+        key, value = key.lower(), value.strip()
+        if key == 'type' and value:
+            # Samakan dengan nama type baku agar cocok dengan index
+            filters['type'] = next((t for t in AIRDROP_TYPES if t.lower() == value.lower()), value)
+        elif key == 'has' and value.lower() in LINK_COLUMNS:
+            filters['has'].append(LINK_COLUMNS[value.lower()])
+        elif key == 'sort' and value.lower() in SORT_COLUMNS:
+            filters['sort'] = value.lower()
+        elif key == 'limit' and value.isdigit() and int(value) > 0:
+            filters['limit'] = int(value)
+        else:
+            raise ValueError(f"Filter '{token}' tidak dikenal")
+    return filters
+
+def has_value(value):
+    return value not in ('', '-')
+
+def bitmap_ids(bitmap):
+    # ID dari bit yang menyala, urut naik
+    bits = bin(bitmap)[:1:-1]
+    pos = bits.find('1')
+    while pos != -1:
+        yield pos
+        pos = bits.find('1', pos + 1)
+
+class FilterIndex:
+    # Index sekunder untuk backend CSV: bitmap per Type dan bitmap keberadaan
+    # tiap kolom link (bit ke-N = row id internal N). Filter digabung dengan AND.
+    def __init__(self):
+        self.live = 0
+        self.by_type = {}
+        self.has = {col: 0 for col in LINK_COLUMNS.values()}
+
+    def add(self, record_id, record):
+        bit = 1 << record_id
+        self.live |= bit
+        self.by_type[record['Type']] = self.by_type.get(record['Type'], 0) | bit
+        for col in self.has:
+            if has_value(record[col]):
+                self.has[col] |= bit
+
+    def remove(self, record_id, record):
+        mask = ~(1 << record_id)
+        self.live &= mask
+        self.by_type[record['Type']] = self.by_type.get(record['Type'], 0) & mask
+        for col in self.has:
+            self.has[col] &= mask
+
+    def rebuild(self, rows):
+        self.live = 0
+        self.by_type = {}
+        self.has = {col: 0 for col in LINK_COLUMNS.values()}
+        for row_id, record in rows:
+            self.add(row_id, record)
+
+    def select(self, filters):
+        bitmap = self.live
+        if filters['type'] is not None:
+            bitmap &= self.by_type.get(filters['type'], 0)
+        for col in filters['has']:
+            bitmap &= self.has[col]
+        return bitmap_ids(bitmap)
+
+class CsvStorage:
+    # ID = posisi baris (mulai dari 1), sama seperti perilaku lama. Isi file
+    # di-cache di memori dan file hanya di-parse ulang jika mtime/ukurannya
+    # berubah (misal diedit dari luar). Perubahan tidak menulis ulang CSV:
+    # setiap add/edit/delete ditambahkan ke journal (fsync per batch) dan
+    # di-replay saat load; CSV snapshot dipadatkan di background.
+    columns = COLUMNS
+    sort_columns = SORT_COLUMNS
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.meta_path = f"{path}.meta"
+        self._records = []
+        self._signature = None
+        self._index = TrigramIndex()
+        self._filters = FilterIndex()
+        # Row id internal per posisi; selalu naik sehingga posisi bisa dicari
+        # dengan bisect
+        self._row_ids = []
+        self._next_row = 1
+        self._seq = 0
+        self._journal = None
+        self._journal_ops = 0
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        self._fsync_timer = None
+        self._lock = threading.Lock()
+        self._compacting = None
+
+    def init(self):
+        if not Path(self.path).exists():
+            self._write_snapshot([], 0)
+        self._load()
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        if self._compacting is not None and self._compacting.is_alive():
+            # CSV sedang diganti oleh pemadatan kita sendiri, cache tetap valid
+            return self._records
+        signature = self._stat()
+        if signature != self._signature:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            self._records = list(csv.DictReader(io.StringIO(data.decode('utf-8'), newline='')))
+            digest = hashlib.sha256(data).hexdigest()
+            meta = self._read_meta()
+            seq = self._snapshot_seq(meta, digest)
+            if seq is None:
+                seq = self._archive_journal(meta, digest)
+            self._seq = seq
+            replayed = self._replay()
+            self._rebuild_indexes()
+            self._signature = signature
+            logger.info(f"📄 {len(self._records)} record dimuat dari {self.path} ({replayed} operasi journal)")
+            if Path(f"{self.journal_path}.1").exists():
+                # Sisa pemadatan yang terputus: padatkan ulang sekarang
+                self._compact(wait=True)
+        return self._records
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _snapshot_seq(self, meta, digest):
+        # Nomor operasi terakhir yang sudah ada di CSV. Operasi journal memakai
+        # posisi baris, jadi hanya boleh di-replay di atas snapshot yang dikenal:
+        # snapshot terakhir, atau snapshot sebelumnya jika pemadatan terputus
+        # sebelum CSV diganti. None berarti CSV diubah dari luar.
+        if meta.get('sha256') == digest:
+            return meta['seq']
+        previous = meta.get('previous') or {}
+        if previous.get('sha256') == digest:
+            return previous['seq']
+        return None
+
+    def _archive_journal(self, meta, digest):
+        # CSV diedit dari luar (atau belum punya meta): journal disisihkan ke file
+        # arsip alih-alih diterapkan ke baris yang salah, lalu CSV ini menjadi
+        # snapshot baru
+        seq = max(meta.get('seq', 0), self._seq)
+        archived = []
+        with self._lock:
+            self._fsync_locked()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            for path in (f"{self.journal_path}.1", self.journal_path):
+                if Path(path).exists():
+                    target = f"{path}.orphan-{stamp}"
+                    os.replace(path, target)
+                    archived.append(target)
+        if archived:
+            logger.warning(
+                f"⚠️ {self.path} berubah di luar bot; journal tidak di-replay dan "
+                f"disimpan sebagai {', '.join(archived)}"
+            )
+        self._write_meta(digest, seq, meta)
+        return seq
+
+    def _replay(self):
+        replayed = 0
+        self._journal_ops = 0
+        for path in (f"{self.journal_path}.1", self.journal_path):
+            if not Path(path).exists():
+                continue
+            with open(path, 'rb+') as f:
+                offset = 0
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError("baris tidak lengkap")
+                        op = json.loads(line)
+                    except ValueError:
+                        # Baris terakhir yang terpotong karena crash: dibuang agar
+                        # operasi berikutnya tidak tertulis di belakangnya
+                        logger.warning(f"Journal {path} terpotong di byte {offset}, sisa diabaikan")
+                        f.truncate(offset)
+                        break
+                    offset += len(line)
+                    self._journal_ops += 1
+                    if op['seq'] <= self._seq:
+                        continue
+                    if not self._apply(op):
+                        logger.warning(f"Operasi journal #{op['seq']} di luar jangkauan ({len(self._records)} record), dilewati")
+                    self._seq = op['seq']
+                    replayed += 1
+        return replayed
+
+    def _apply(self, op):
+        if op['op'] == 'add':
+            self._records.append(op['record'])
+            return True
+        if not 0 < op['id'] <= len(self._records):
+            return False
+        if op['op'] == 'update':
+            self._records[op['id'] - 1] = op['record']
+        elif op['op'] == 'delete':
+            self._records.pop(op['id'] - 1)
+        return True
+
+    def _append(self, op):
+        self._seq += 1
+        op['seq'] = self._seq
+        line = json.dumps(op, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write(line)
+            self._journal.flush()
+            self._unsynced += 1
+            self._journal_ops += 1
+            if self._unsynced >= JOURNAL_FSYNC_BATCH or time.monotonic() - self._last_fsync >= JOURNAL_FSYNC_INTERVAL:
+                self._fsync_locked()
+            elif self._fsync_timer is None:
+                # Operasi yang belum di-fsync tetap di-sync paling lambat setelah interval
+                self._fsync_timer = threading.Timer(JOURNAL_FSYNC_INTERVAL, self.sync)
+                self._fsync_timer.daemon = True
+                self._fsync_timer.start()
+
+    def _maybe_compact(self):
+        # Dipanggil setelah perubahan diterapkan ke memori, agar snapshot memuatnya
+        if self._journal_ops >= JOURNAL_COMPACT_THRESHOLD:
+            self._compact()
+
+    def _fsync_locked(self):
+        if self._journal is not None and self._unsynced:
+            os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            self._fsync_timer = None
+            self._fsync_locked()
+
+    def _write_snapshot(self, records, seq):
+        # Meta ditulis dulu: jika crash sebelum CSV diganti, CSV lama masih
+        # dikenali lewat hash "previous" dan journal-nya tetap di-replay
+        buf = io.StringIO(newline='')
+        writer = csv.DictWriter(buf, fieldnames=self.columns)
+        writer.writeheader()
+        writer.writerows(records)
+        data = buf.getvalue().encode('utf-8')
+        self._write_meta(hashlib.sha256(data).hexdigest(), seq, self._read_meta())
+        self._write_file(self.path, data)
+
+    def _write_meta(self, digest, seq, previous):
+        meta = {'seq': seq, 'sha256': digest}
+        if previous.get('sha256') and previous['sha256'] != digest:
+            meta['previous'] = {'seq': previous['seq'], 'sha256': previous['sha256']}
+        self._write_file(self.meta_path, json.dumps(meta).encode('utf-8'))
+
+    @staticmethod
+    def _write_file(path, content):
+        # Tulis ke file sementara lalu os.replace, jadi file tidak pernah setengah jadi
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _compact(self, wait=False):
+        if self._compacting is not None and self._compacting.is_alive():
+            return
+        # Journal aktif diputar ke .1; operasi baru masuk ke journal kosong
+        with self._lock:
+            self._fsync_locked()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            rotated = f"{self.journal_path}.1"
+            if Path(self.journal_path).exists():
+                if Path(rotated).exists():
+                    # .1 belum selesai dipadatkan: gabungkan agar tidak ada operasi hilang
+                    with open(rotated, 'a', encoding='utf-8') as dst, open(self.journal_path, 'r', encoding='utf-8') as src:
+                        shutil.copyfileobj(src, dst)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, rotated)
+            self._journal_ops = 0
+        records, seq = list(self._records), self._seq
+
+        def run():
+            try:
+                self._write_snapshot(records, seq)
+                self._signature = self._stat()
+                if Path(rotated).exists():
+                    os.remove(rotated)
+                logger.info(f"🗜️ Journal dipadatkan ke {self.path} ({len(records)} record)")
+            except Exception:
+                logger.exception("Gagal memadatkan journal")
+
+        self._compacting = threading.Thread(target=run, name="csv-compact", daemon=False)
+        self._compacting.start()
+        if wait:
+            self._compacting.join()
+
+    def close(self):
+        if self._compacting is not None:
+            self._compacting.join()
+        with self._lock:
+            if self._fsync_timer is not None:
+                self._fsync_timer.cancel()
+                self._fsync_timer = None
+            self._fsync_locked()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def _rebuild_indexes(self):
+        self._row_ids = list(range(1, len(self._records) + 1))
+        self._next_row = len(self._records) + 1
+        rows = list(zip(self._row_ids, self._records))
+        self._index.rebuild(rows)
+        self._filters.rebuild(rows)
+
+    def _position(self, row_id):
+        return bisect.bisect_left(self._row_ids, row_id) + 1
+
+    def all(self):
+        return list(enumerate(self._load(), 1))
+
+    def get(self, record_id):
+        records = self._load()
+        return records[record_id - 1] if 0 < record_id <= len(records) else None
+
+    def add(self, record):
+        records = self._load()
+        record = {col: record[col] for col in self.columns}
+        self._append({'op': 'add', 'record': record})
+        records.append(record)
+        row_id = self._next_row
+        self._next_row += 1
+        self._row_ids.append(row_id)
+        self._index.add(row_id, record)
+        self._filters.add(row_id, record)
+        self._maybe_compact()
+        return len(records)
+
+    def update(self, record_id, record):
+        records = self._load()
+        if not 0 < record_id <= len(records):
+            return False
+        record = {col: record[col] for col in self.columns}
+        self._append({'op': 'update', 'id': record_id, 'record': record})
+        row_id = self._row_ids[record_id - 1]
+        self._index.remove(row_id, records[record_id - 1])
+        self._filters.remove(row_id, records[record_id - 1])
+        records[record_id - 1] = record
+        self._index.add(row_id, record)
+        self._filters.add(row_id, record)
+        self._maybe_compact()
+        return True
+
+    def delete(self, record_id):
+        records = self._load()
+        if not 0 < record_id <= len(records):
+            return False
+        self._append({'op': 'delete', 'id': record_id})
+        # ID posisi record sesudahnya bergeser, tetapi row id internalnya tidak:
+        # index hanya perlu membuang record ini
+        row_id = self._row_ids.pop(record_id - 1)
+        self._index.remove(row_id, records[record_id - 1])
+        self._filters.remove(row_id, records[record_id - 1])
+        records.pop(record_id - 1)
+        self._maybe_compact()
+        return True
+
+    def search(self, keyword):
+        if len(keyword) < 3:
+            candidates = self.all()
+        else:
+            records = self._load()
+            positions = (self._position(row_id) for row_id in self._index.candidates(keyword))
+            candidates = [(record_id, records[record_id - 1]) for record_id in positions]
+        return rank_matches(keyword, candidates)
+
+    def query(self, filters):
+        records = self._load()
+        # Row id naik searah dengan posisi, jadi urutan bitmap = urutan ID
+        ids = (self._position(row_id) for row_id in self._filters.select(filters))
+        sort_col = self.sort_columns[filters['sort']]
+        if sort_col is None:
+            # Bitmap sudah urut ID, cukup ambil sampai limit
+            return [(record_id, records[record_id - 1]) for record_id in itertools.islice(ids, filters['limit'])]
+        matches = sorted(
+            ((record_id, records[record_id - 1]) for record_id in ids),
+            key=lambda r: (r[1][sort_col].lower(), r[0])
+        )
+        return matches[:filters['limit']]
+
+    def count(self):
+        return len(self._load())
+
+    def count_by_type(self):
+        stats = {}
+        for record in self._load():
+            stats[record['Type']] = stats.get(record['Type'], 0) + 1
+        return stats
+
+class SqliteStorage:
+    # ID = primary key yang tetap walaupun record lain dihapus. Subclass bisa
+    # menambah kolom turunan (derived_columns) yang diisi _values() di setiap
+    # add/update/import, misalnya kolom ber-index untuk pengurutan
+    columns = COLUMNS
+    sort_columns = SORT_COLUMNS
+    derived_columns = ()
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+
+    def init(self):
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS airdrops ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                + ", ".join(f"{col} TEXT NOT NULL DEFAULT '-'" for col in self.columns)
+                + "".join(f", {col} TEXT" for col in self.derived_columns)
+                + ")"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_airdrops_nama ON airdrops (Nama COLLATE NOCASE)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_airdrops_type ON airdrops (Type)")
+            # Partial index per kolom link berperan sebagai bitmap keberadaan
+            for col in LINK_COLUMNS.values():
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_airdrops_has_{col.lower()} "
+                    f"ON airdrops (Type) WHERE {col} NOT IN ('', '-')"
+                )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.fts = self._init_fts()
+
+    def _init_fts(self):
+        # Index FTS5 trigram yang dijaga trigger, jadi selalu sinkron dengan tabel
+        cols = ', '.join(self.columns)
+        new_cols = ', '.join(f'new.{col}' for col in self.columns)
+        old_cols = ', '.join(f'old.{col}' for col in self.columns)
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'airdrops_fts'"
+        ).fetchone()
+        try:
+            with self.conn:
+                self.conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS airdrops_fts USING fts5("
+                    f"{cols}, content='airdrops', content_rowid='id', tokenize='trigram')"
+                )
+                self.conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS airdrops_fts_ai AFTER INSERT ON airdrops BEGIN "
+                    f"INSERT INTO airdrops_fts (rowid, {cols}) VALUES (new.id, {new_cols}); END"
+                )
+                self.conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS airdrops_fts_ad AFTER DELETE ON airdrops BEGIN "
+                    f"INSERT INTO airdrops_fts (airdrops_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+                )
+                self.conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS airdrops_fts_au AFTER UPDATE ON airdrops BEGIN "
+                    f"INSERT INTO airdrops_fts (airdrops_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                    f"INSERT INTO airdrops_fts (rowid, {cols}) VALUES (new.id, {new_cols}); END"
+                )
+                if not exists:
+                    self.conn.execute("INSERT INTO airdrops_fts (airdrops_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram tidak tersedia, pencarian memakai LIKE: {e}")
+            return False
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _record(self, row):
+        return {col: row[col] for col in self.columns}
+
+    def _values(self, record):
+        # Nilai untuk kolom self.columns + self.derived_columns, berurutan
+        return [record[col] for col in self.columns]
+
+    def _insert_sql(self):
+        cols = list(self.columns) + list(self.derived_columns)
+        return f"INSERT INTO airdrops ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+
+    def all(self):
+        rows = self.conn.execute("SELECT * FROM airdrops ORDER BY id")
+        return [(row['id'], self._record(row)) for row in rows]
+
+    def get(self, record_id):
+        row = self.conn.execute("SELECT * FROM airdrops WHERE id = ?", (record_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def add(self, record):
+        with self.conn:
+            cur = self.conn.execute(self._insert_sql(), self._values(record))
+        return cur.lastrowid
+
+    def update(self, record_id, record):
+        with self.conn:
+            cols = list(self.columns) + list(self.derived_columns)
+            cur = self.conn.execute(
+                f"UPDATE airdrops SET {', '.join(f'{col} = ?' for col in cols)} WHERE id = ?",
+                self._values(record) + [record_id]
+            )
+        return cur.rowcount > 0
+
+    def delete(self, record_id):
+        with self.conn:
+            cur = self.conn.execute("DELETE FROM airdrops WHERE id = ?", (record_id,))
+        return cur.rowcount > 0
+
+    def search(self, keyword):
+        terms = [gram for gram in trigrams(keyword) if gram == gram.strip()]
+        if self.fts and terms:
+            # OR semua trigram keyword: record yang berbagi lebih banyak trigram
+            # (toleran salah ketik) mendapat skor bm25 lebih baik
+            match = ' OR '.join('"' + gram.replace('"', '""') + '"' for gram in terms)
+            weights = ', '.join(str(SEARCH_WEIGHTS.get(col, 1)) for col in self.columns)
+            rows = self.conn.execute(
+                f"SELECT a.* FROM airdrops_fts JOIN airdrops a ON a.id = airdrops_fts.rowid "
+                f"WHERE airdrops_fts MATCH ? ORDER BY bm25(airdrops_fts, {weights}) LIMIT ?",
+                (match, SEARCH_CANDIDATES)
+            )
+        else:
+            pattern = '%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            rows = self.conn.execute(
+                "SELECT * FROM airdrops WHERE "
+                + " OR ".join(f"{col} LIKE ? ESCAPE '\\'" for col in self.columns)
+                + " ORDER BY id LIMIT ?",
+                [pattern] * len(self.columns) + [SEARCH_CANDIDATES]
+            )
+        return rank_matches(keyword, ((row['id'], self._record(row)) for row in rows))
+
+    def query(self, filters):
+        where, params = [], []
+        if filters['type'] is not None:
+            where.append("Type = ?")
+            params.append(filters['type'])
+        for col in filters['has']:
+            # Harus sama persis dengan predikat partial index agar index dipakai
+            where.append(f"{col} NOT IN ('', '-')")
+        sort_col = self.sort_columns[filters['sort']]
+        sql = "SELECT * FROM airdrops"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {sort_col} COLLATE NOCASE, id" if sort_col else " ORDER BY id"
+        if filters['limit']:
+            sql += " LIMIT ?"
+            params.append(filters['limit'])
+        rows = self.conn.execute(sql, params)
+        return [(row['id'], self._record(row)) for row in rows]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM airdrops").fetchone()[0]
+
+    def count_by_type(self):
+        rows = self.conn.execute("SELECT Type, COUNT(*) AS total FROM airdrops GROUP BY Type")
+        return {row['Type']: row['total'] for row in rows}
+
+    def import_csv(self, path):
+        # Import satu kali dari CSV lama; ditandai di tabel meta agar tidak terulang
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone():
+            return 0
+        imported = 0
+        if Path(path).exists():
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                rows = [
+                    self._values({col: (row.get(col) or '-').strip() or '-' for col in self.columns})
+                    for row in csv.DictReader(f)
+                ]
+            with self.conn:
+                self.conn.executemany(self._insert_sql(), rows)
+            imported = len(rows)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('csv_imported', ?)",
+                (datetime.now().isoformat(),)
+            )
+        return imported
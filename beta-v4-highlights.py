@@ -1,9 +1,15 @@
+import time
+
+# Dipakai untuk mengukur waktu startup sampai bot siap menerima update; diambil
+# sebelum import telegram/instaloader agar waktu import ikut terhitung
+STARTUP_STARTED = time.monotonic()
+
 import logging
 import re
 import os
-import time
 import random
 import json
+import asyncio
 import requests
 import glob
 import shutil
@@ -74,7 +80,22 @@ loader = Instaloader(
     request_timeout=30
 )
 
-try:
+# Session disimpan ke file agar restart tidak perlu membangun dan memverifikasi ulang
+SESSION_FILE = os.getenv("INSTAGRAM_SESSION_FILE", f"session-{env_vars['INSTAGRAM_USERNAME']}")
+# Target waktu dari start proses sampai bot siap menerima update (detik)
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "1.0"))
+
+def load_session():
+    # Pakai session tersimpan (tanpa request jaringan) selama sessionid-nya sama dengan .env
+    if os.path.exists(SESSION_FILE):
+        try:
+            loader.load_session_from_file(env_vars['INSTAGRAM_USERNAME'], SESSION_FILE)
+            if loader.context._session.cookies.get("sessionid") == env_vars['INSTAGRAM_SESSIONID']:
+                logger.info(f"📂 Session dimuat dari {SESSION_FILE}")
+                return
+        except Exception as e:
+            logger.warning(f"⚠️ Session file tidak bisa dipakai: {str(e)}")
+
     # Buat cookie jar
     cookie_jar = RequestsCookieJar()
     cookies = {
@@ -91,15 +112,35 @@ try:
     
     loader.context._session.cookies = cookie_jar
     loader.context.username = env_vars['INSTAGRAM_USERNAME']
-    
-    # Verifikasi session
-    test_profile = Profile.from_username(loader.context, env_vars['INSTAGRAM_USERNAME'])
-    logger.info(f"✅ Login berhasil sebagai: {test_profile.full_name}")
+    loader.save_session_to_file(SESSION_FILE)
 
+try:
+    load_session()
 except Exception as e:
-    logger.error(f"❌ Gagal login: {str(e)}")
+    logger.error(f"❌ Gagal menyiapkan session: {str(e)}")
     exit(1)
 
+async def validate_session():
+    # Verifikasi session di background setelah bot mulai polling
+    try:
+        loop = asyncio.get_running_loop()
+        test_profile = await loop.run_in_executor(
+            None, Profile.from_username, loader.context, env_vars['INSTAGRAM_USERNAME']
+        )
+        logger.info(f"✅ Login berhasil sebagai: {test_profile.full_name}")
+    except Exception as e:
+        logger.error(f"❌ Gagal login: {str(e)}")
+        # Session tersimpan hanya dibuang jika memang tidak berlaku lagi, bukan
+        # karena error jaringan/429, agar start berikutnya membangun ulang dari .env
+        if is_session_invalid(e) and os.path.exists(SESSION_FILE):
+            os.remove(SESSION_FILE)
+
+def is_session_invalid(error):
+    if isinstance(error, LoginRequiredException):
+        return True
+    text = str(error).lower()
+    return any(word in text for word in ("checkpoint", "challenge", "login_required"))
+
 # ========== BOT HANDLERS ==========
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
@@ -475,8 +516,17 @@ async def handle_profile_info(query, username):
         logger.error(f"Profile info error: {str(e)}")
         await query.message.reply_text("⚠️ Gagal mengambil info profil")
 
+async def post_init(application: Application) -> None:
+    elapsed = time.monotonic() - STARTUP_STARTED
+    if elapsed > STARTUP_BUDGET:
+        logger.warning(f"🐢 Startup {elapsed:.2f} detik, melebihi budget {STARTUP_BUDGET} detik")
+    else:
+        logger.info(f"🚀 Startup {elapsed:.2f} detik")
+    # Verifikasi login tidak menahan polling
+    application.bot_data['session_check'] = asyncio.create_task(validate_session())
+
 def main():
-    application = Application.builder().token(env_vars['TOKEN_BOT']).build()
+    application = Application.builder().token(env_vars['TOKEN_BOT']).post_init(post_init).build()
     
     # Tambah handler
     application.add_handler(CommandHandler("start", start))
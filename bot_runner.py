@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import os
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# ========== WEBHOOK & PEMROSESAN UPDATE ==========
+# Dipakai bersama oleh semua bot. Jika WEBHOOK_URL diisi, bot menerima update
+# lewat webhook (server HTTP lokal di belakang reverse proxy), selain itu tetap
+# polling. Update diproses bersamaan, tetapi update dari chat yang sama tetap
+# berurutan. Env dibaca saat dipakai, setelah bot memanggil load_dotenv().
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates=None):
+        if max_concurrent_updates is None:
+            max_concurrent_updates = int(os.getenv("MAX_CONCURRENT_UPDATES", "256"))
+        super().__init__(max_concurrent_updates)
+        self._chat_locks = {}  # chat_id -> [lock, jumlah pemakai]
+
+    async def do_process_update(self, update, coroutine):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await coroutine
+            return
+
+        entry = self._chat_locks.setdefault(chat.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._chat_locks.pop(chat.id, None)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+def run_application(application):
+    webhook_url = os.getenv("WEBHOOK_URL")
+    if webhook_url:
+        listen = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+        port = int(os.getenv("WEBHOOK_PORT", "8443"))
+        path = os.getenv("WEBHOOK_PATH", "telegram")
+        logger.info(f"🌐 Mode webhook di {listen}:{port}/{path}")
+        application.run_webhook(
+            listen=listen,
+            port=port,
+            url_path=path,
+            webhook_url=f"{webhook_url.rstrip('/')}/{path}",
+            secret_token=os.getenv("WEBHOOK_SECRET")
+        )
+    else:
+        application.run_polling()
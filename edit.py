@@ -1,9 +1,6 @@
 import logging
 import os
 import time
-import csv
-from pathlib import Path
-from datetime import datetime
 from urllib.parse import urlparse
 
 from dotenv import load_dotenv
@@ -17,6 +14,8 @@ from telegram.ext import (
     ContextTypes,
     TypeHandler
 )
+from bot_runner import PerChatUpdateProcessor, run_application
+from airdrop_storage import CsvStorage, SqliteStorage, parse_list_query
 
 # Load environment variables
 load_dotenv()
@@ -39,36 +38,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# CSV Functions
-def init_csv():
-    if not Path(CSV_FILE).exists():
-        with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Nama', 'Twitter', 'Discord', 'Telegram', 'Link', 'Type'])
-
-def append_to_csv(data):
-    with open(CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(data)
-
-def read_csv():
-    with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        return list(reader)
-
-def update_csv(records):
-    with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['Nama', 'Twitter', 'Discord', 'Telegram', 'Link', 'Type'])
-        writer.writeheader()
-        writer.writerows(records)
-
-def delete_from_csv(index):
-    records = read_csv()
-    if 0 <= index < len(records):
-        records.pop(index)
-        update_csv(records)
-        return True
-    return False
+# ========== STORAGE ==========
+# Backend penyimpanan bisa dipilih lewat STORAGE_BACKEND: "sqlite" (default,
+# ber-index) atau "csv" (di-cache di memori, di-parse ulang hanya jika file
+# berubah; perubahan ditulis ke journal dan dipadatkan di background).
+# Keduanya ada di airdrop_storage.py. Semua handler hanya memakai antarmuka
+# backend; record berupa dict dengan kolom COLUMNS.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+DB_FILE = os.getenv('DB_FILE', 'ytta.db')
+
+def create_storage():
+    if STORAGE_BACKEND == 'csv':
+        return CsvStorage(CSV_FILE)
+    return SqliteStorage(DB_FILE)
+
+storage = create_storage()
+
+def init_storage():
+    storage.init()
+    if isinstance(storage, SqliteStorage):
+        imported = storage.import_csv(CSV_FILE)
+        if imported:
+            logger.info(f"📥 {imported} record diimpor dari {CSV_FILE} ke {DB_FILE}")
 
 # Utility functions
 def is_valid_url(url):
@@ -78,15 +69,6 @@ def is_valid_url(url):
     except:
         return False
 
-# Add this new function to handle updating existing records
-def update_record_in_csv(index, data):
-    records = read_csv()
-    if 0 <= index < len(records):
-        records[index] = data
-        update_csv(records)
-        return True
-    return False
-
 async def limit_rate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if context.user_data.get('last_request'):
@@ -243,20 +225,13 @@ async def save_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Check if this is an edit operation
         if 'edit_id' in context.user_data:
-            if update_record_in_csv(context.user_data['edit_id'], data):
+            if storage.update(context.user_data['edit_id'], data):
                 await update.message.reply_text('✅ Data berhasil diperbarui!')
             else:
                 await update.message.reply_text('❌ Gagal memperbarui data')
         else:
             # This is a new entry
-            append_to_csv([
-                data['Nama'],
-                data['Twitter'],
-                data['Discord'],
-                data['Telegram'],
-                data['Link'],
-                data['Type']
-            ])
+            storage.add(data)
             await update.message.reply_text('✅ Data berhasil disimpan!')
             
         # Clear the edit_id from context
@@ -264,22 +239,21 @@ async def save_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
             del context.user_data['edit_id']
             
     except Exception as e:
-        logger.exception("Error saving to CSV:")
+        logger.exception("Error saving record:")
         await update.message.reply_text('🔥 Error sistem! Hubungi admin')
     
     return ConversationHandler.END
 
 async def edit_airdrop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        airdrop_id = int(update.message.text.split(' ', 1)[1]) - 1
+        airdrop_id = int(update.message.text.split(' ', 1)[1])
     except (IndexError, ValueError):
         await update.message.reply_text("❌ Format edit salah\nContoh: /edit 1")
         return
 
-    records = read_csv()
-    if 0 <= airdrop_id < len(records):
+    record = storage.get(airdrop_id)
+    if record:
         context.user_data['edit_id'] = airdrop_id
-        record = records[airdrop_id]
         
         # Store current values
         context.user_data['nama'] = record['Nama']
@@ -320,15 +294,28 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 async def list_airdrops(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    parts = update.message.text.split(' ', 1)
+    query_text = parts[1].strip() if len(parts) > 1 else ''
     try:
-        records = read_csv()
+        filters = parse_list_query(query_text) if query_text else None
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\nContoh: /list type:Testnet has:discord sort:nama limit:20"
+        )
+        return
+
+    try:
+        records = storage.query(filters) if filters else storage.all()
         
         if not records:
-            await update.message.reply_text("📭 Database airdrop kosong")
+            if filters:
+                await update.message.reply_text("📭 Tidak ada airdrop yang cocok dengan filter")
+            else:
+                await update.message.reply_text("📭 Database airdrop kosong")
             return
             
         response = "📋 <b>DAFTAR AIRDROP</b>\n\n"
-        for idx, record in enumerate(records, 1):
+        for idx, record in records:
             entry = (
                 f"━━━━━━━━━━━━━━━━━\n"
                 f"🆔 <b>Entry {idx}</b>\n\n"
@@ -361,22 +348,17 @@ async def search_airdrops(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     try:
-        records = read_csv()
-        
-        results = []
-        for record in records:
-            if (keyword in record['Nama'].lower() or 
-                keyword in record['Type'].lower()):
-                results.append(record)
+        results = storage.search(keyword)
         
         if not results:
             await update.message.reply_text(f"🔍 Tidak ditemukan airdrop dengan kata kunci '{keyword}'")
             return
             
         response = f"🔍 <b>HASIL PENCARIAN '{keyword.upper()}':</b>\n\n"
-        for result in results:
+        for idx, result in results:
             entry = (
                 f"━━━━━━━━━━━━━━━━━\n"
+                f"🆔 <b>Entry {idx}</b>\n\n"
                 f"<b>Nama:</b> {result['Nama']}\n"
                 f"<b>Twitter:</b> {result['Twitter']}\n"
                 f"<b>Discord:</b> {result['Discord']}\n"
@@ -400,21 +382,18 @@ async def search_airdrops(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        records = read_csv()
+        total = storage.count()
         
-        if not records:
+        if not total:
             await update.message.reply_text("📭 Database airdrop kosong")
             return
             
         # Hitung statistik
-        stats = {}
-        for record in records:
-            airdrop_type = record['Type']
-            stats[airdrop_type] = stats.get(airdrop_type, 0) + 1
+        stats = storage.count_by_type()
             
         # Format pesan
         message = "📊 <b>STATISTIK AIRDROP</b>\n\n"
-        message += f"🪙 Total Airdrop: {len(records)}\n"
+        message += f"🪙 Total Airdrop: {total}\n"
         message += "━━━━━━━━━━━━━━━━━\n"
         
         # Urutkan dari yang terbanyak
@@ -447,6 +426,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📚 Panduan Penggunaan:
 /start - Mulai input data baru
 /list - Tampilkan semua airdrop
+/list [filter] - Filter: type:Testnet has:discord sort:nama limit:20
 /stats - Tampilkan statistik
 /search [keyword] - Cari airdrop
 /edit [ID] - Edit airdrop berdasarkan ID
@@ -458,12 +438,12 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def delete_airdrop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        airdrop_id = int(update.message.text.split(' ', 1)[1]) - 1
+        airdrop_id = int(update.message.text.split(' ', 1)[1])
     except (IndexError, ValueError):
         await update.message.reply_text("❌ Format delete salah\nContoh: /delete 1")
         return
 
-    if delete_from_csv(airdrop_id):
+    if storage.delete(airdrop_id):
         await update.message.reply_text("✅ Airdrop berhasil dihapus")
     else:
         await update.message.reply_text("❌ ID tidak valid")
@@ -472,8 +452,13 @@ async def invalid_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("⚠️ Input tidak valid! Silakan ikuti petunjuk (/help untuk bantuan)")
 
 def main():
-    init_csv()
-    application = Application.builder().token(TOKEN).build()
+    init_storage()
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(PerChatUpdateProcessor())
+        .build()
+    )
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('start', start)],
@@ -517,7 +502,10 @@ def main():
     application.add_handler(CommandHandler('help', help_command))
     application.add_handler(TypeHandler(Update, limit_rate), group=-1)
 
-    application.run_polling()
+    try:
+        run_application(application)
+    finally:
+        storage.close()
 
 if __name__ == '__main__':
     main()
@@ -1,14 +1,37 @@
+import time
+
+# Dipakai untuk mengukur waktu startup sampai bot siap menerima update; diambil
+# sebelum import telegram/instaloader agar waktu import ikut terhitung
+STARTUP_STARTED = time.monotonic()
+
 import logging
 import re
 import os
 import pytz
-import time
 import random
 import json
 import requests
-import glob
-import shutil
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import asyncio
+import threading
+import functools
+import itertools
+import contextlib
+import contextvars
+import tempfile
+import hashlib
+from urllib.parse import urlparse
+from datetime import timedelta
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from telegram import (
+    Update,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InputMediaPhoto,
+    InputMediaVideo
+)
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -17,9 +40,20 @@ from telegram.ext import (
     filters,
     CallbackQueryHandler
 )
+from bot_runner import PerChatUpdateProcessor, run_application
 import instaloader
-from instaloader import Instaloader, Profile, QueryReturnedBadRequestException
+from instaloader import (
+    Instaloader,
+    Profile,
+    RateController,
+    ConnectionException,
+    QueryReturnedBadRequestException,
+    QueryReturnedNotFoundException,
+    TooManyRequestsException,
+    LoginRequiredException
+)
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from requests.cookies import RequestsCookieJar
 
 load_dotenv()
@@ -66,46 +100,1250 @@ def get_random_headers():
         "X-CSRFToken": env_vars['INSTAGRAM_CSRFTOKEN']
     }
 
-# ========== INSTAGRAM SETUP ==========
-loader = Instaloader(
-    user_agent=random.choice(USER_AGENTS),
-    sleep=True,
-    quiet=True,
-    request_timeout=30,
-    dirname_pattern="{target}",
-    filename_pattern="{date_utc}_UTC_{profile}",
-    download_pictures=True, download_videos=True,
-    download_video_thumbnails=False, download_geotags=False,
-    post_metadata_txt_pattern="",
-    storyitem_metadata_txt_pattern="",
-    compress_json=False, download_comments=False
+# ========== EXECUTOR ==========
+# Semua panggilan blocking (instaloader & requests) dijalankan di thread pool
+# supaya event loop Telegram tetap melayani chat lain selama fetch berjalan
+IG_WORKERS = int(os.getenv("IG_WORKERS", "4"))
+IG_WORKERS_PER_CHAT = int(os.getenv("IG_WORKERS_PER_CHAT", "2"))
+
+executor = ThreadPoolExecutor(max_workers=IG_WORKERS, thread_name_prefix="ig-worker")
+
+# Slot worker dibagi per kelas prioritas dengan weighted fair queuing:
+# "interactive" (aksi ringan), "bulk" (unduhan story/highlight) dan
+# "background" (pelacakan berkala). Kelas aktif diambil dari work_class.
+WORK_CLASS_WEIGHTS = {"interactive": 8, "bulk": 3, "background": 1}
+# Slot yang hanya boleh dipakai kelas interactive, agar aksi ringan tetap
+# cepat walau semua worker lain sedang dipakai unduhan panjang
+INTERACTIVE_RESERVED_WORKERS = int(os.getenv("INTERACTIVE_RESERVED_WORKERS", "1"))
+
+work_class = contextvars.ContextVar("work_class", default="interactive")
+
+class WorkScheduler:
+    def __init__(self, slots, weights, reserved):
+        self.slots = slots
+        self.weights = weights
+        self.reserved = min(reserved, slots - 1)
+        self.running = 0
+        self._queues = {name: deque() for name in weights}
+        self._vtime = {name: 0.0 for name in weights}
+        self._clock = 0.0
+        self._waits = {name: [0, 0.0, 0.0] for name in weights}  # jumlah, total, maks
+
+    def _limit(self, name):
+        return self.slots if name == "interactive" else self.slots - self.reserved
+
+    async def acquire(self, name):
+        queued_at = time.monotonic()
+        if not self._queues[name]:
+            # Kelas yang baru aktif tidak boleh menagih jatah masa idle-nya
+            self._vtime[name] = max(self._vtime[name], self._clock)
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[name].append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                with contextlib.suppress(ValueError):
+                    self._queues[name].remove(waiter)
+            raise
+
+        waited = time.monotonic() - queued_at
+        stats = self._waits[name]
+        stats[0] += 1
+        stats[1] += waited
+        stats[2] = max(stats[2], waited)
+
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while (name := self._pick()) is not None:
+            waiter = self._queues[name].popleft()
+            if waiter.cancelled():
+                continue
+            self._grant(name)
+            waiter.set_result(None)
+
+    def _pick(self):
+        # Kelas dengan virtual time terkecil yang masih punya slot dilayani duluan
+        ready = [
+            name for name, queue in self._queues.items()
+            if queue and self.running < self._limit(name)
+        ]
+        return min(ready, key=lambda name: self._vtime[name]) if ready else None
+
+    def _grant(self, name):
+        self.running += 1
+        self._clock = self._vtime[name]
+        self._vtime[name] += 1 / self.weights[name]
+
+    def stats(self):
+        lines = []
+        for name, (count, total, longest) in self._waits.items():
+            average = total / count if count else 0.0
+            lines.append(
+                f"• {name}: antrean {len(self._queues[name])}, {count} dilayani, "
+                f"tunggu rata-rata {average:.2f}s, maks {longest:.1f}s"
+            )
+        return lines
+
+work_scheduler = WorkScheduler(IG_WORKERS, WORK_CLASS_WEIGHTS, INTERACTIVE_RESERVED_WORKERS)
+
+# chat_id -> [semaphore, jumlah pemakai]; dihapus saat tidak dipakai lagi
+chat_slots = {}
+
+async def run_blocking(chat_id, func, *args, **kwargs):
+    name = work_class.get()
+    if name == "interactive":
+        # Aksi ringan tidak ikut antre di batas per chat, agar tidak tertahan
+        # di belakang unduhan massal milik chat yang sama
+        return await run_scheduled(name, func, *args, **kwargs)
+    # Batasi worker per chat agar satu chat tidak memonopoli seluruh pool
+    slot = chat_slots.setdefault(chat_id, [asyncio.Semaphore(IG_WORKERS_PER_CHAT), 0])
+    slot[1] += 1
+    try:
+        async with slot[0]:
+            return await run_scheduled(name, func, *args, **kwargs)
+    finally:
+        slot[1] -= 1
+        if slot[1] == 0:
+            chat_slots.pop(chat_id, None)
+
+async def run_scheduled(name, func, *args, **kwargs):
+    await work_scheduler.acquire(name)
+    loop = asyncio.get_running_loop()
+    future = executor.submit(functools.partial(func, *args, **kwargs))
+    handed_off = False
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # Thread executor bisa masih berjalan setelah pemanggil dibatalkan;
+        # slot baru dikembalikan saat thread itu benar-benar selesai
+        def on_done(_):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(work_scheduler.release)
+        future.add_done_callback(on_done)
+        handed_off = True
+        raise
+    finally:
+        if not handed_off:
+            work_scheduler.release()
+
+# ========== RATE LIMITER ==========
+# Token bucket global: pacing dibagi rata ke semua chat tanpa memblokir event loop
+class TokenBucket:
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate  # token per detik
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()  # FIFO, yang antre duluan dilayani duluan
+        self._waiting = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        self._waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    self._refill()
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return
+                    await asyncio.sleep((tokens - self._tokens) / self.rate)
+        finally:
+            self._waiting -= 1
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    def stats(self):
+        self._refill()
+        return f"{self.name}: antrean {self._waiting}, token {self._tokens:.1f}/{self.capacity}"
+
+# Unduhan media CDN tidak memakai kuota akun Instagram, dibatasi terpisah
+cdn_limiter = TokenBucket(
+    "cdn",
+    rate=float(os.getenv("CDN_RATE", "5")),
+    capacity=int(os.getenv("CDN_BURST", "10"))
+)
+
+# ========== DISPATCHER TELEGRAM ==========
+# Semua upload media lewat satu dispatcher: antrean FIFO per chat, batas global
+# (~30 pesan/detik) dan per chat (~1/detik, 20/menit di grup), serta RetryAfter
+# dihormati persis sebelum pesan dicoba lagi.
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+TG_GROUP_PER_MINUTE = float(os.getenv("TG_GROUP_PER_MINUTE", "20"))
+TG_CHAT_QUEUE_MAX = int(os.getenv("TG_CHAT_QUEUE_MAX", "200"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))
+# Worker chat berhenti setelah antrean kosong selama ini (detik)
+TG_WORKER_IDLE = 60
+
+class SendDroppedError(Exception):
+    pass
+
+def is_stale_file_id(error):
+    # BadRequest dari Telegram saat file_id lama sudah tidak berlaku
+    message = str(error).lower()
+    return isinstance(error, BadRequest) and ("file identifier" in message or "file reference" in message)
+
+def retry_after_delay(error):
+    # RetryAfter.retry_after bisa int (detik) atau timedelta tergantung versi PTB
+    delay = error.retry_after
+    return delay.total_seconds() if isinstance(delay, timedelta) else float(delay)
+
+class TelegramDispatcher:
+    def __init__(self):
+        self.global_limiter = TokenBucket("telegram", rate=TG_GLOBAL_RATE, capacity=int(TG_GLOBAL_RATE))
+        self._chats = {}  # chat_id -> {"queue", "limiter", "worker"}
+        self.sent = 0
+        self.dropped = 0
+        self.stale_file_ids = 0
+        self.retry_after_hits = 0
+        self._latencies = deque(maxlen=500)
+
+    def _chat(self, chat_id):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            # chat_id negatif = grup/channel
+            if isinstance(chat_id, int) and chat_id < 0:
+                limiter = TokenBucket(f"chat {chat_id}", rate=TG_GROUP_PER_MINUTE / 60, capacity=3)
+            else:
+                limiter = TokenBucket(f"chat {chat_id}", rate=TG_CHAT_RATE, capacity=1)
+            chat = self._chats[chat_id] = {"queue": deque(), "limiter": limiter, "wakeup": asyncio.Event(), "worker": None}
+        if chat["worker"] is None or chat["worker"].done():
+            chat["worker"] = asyncio.ensure_future(self._run(chat_id, chat))
+        return chat
+
+    async def send(self, chat_id, factory):
+        # factory: fungsi tanpa argumen yang mengembalikan coroutine panggilan Bot API
+        chat = self._chat(chat_id)
+        if len(chat["queue"]) >= TG_CHAT_QUEUE_MAX:
+            self.dropped += 1
+            raise SendDroppedError(f"Antrean kirim chat {chat_id} penuh")
+        future = asyncio.get_running_loop().create_future()
+        chat["queue"].append((factory, future, time.monotonic()))
+        chat["wakeup"].set()
+        return await future
+
+    async def _run(self, chat_id, chat):
+        queue = chat["queue"]
+        while True:
+            if not queue:
+                chat["wakeup"].clear()
+                try:
+                    await asyncio.wait_for(chat["wakeup"].wait(), TG_WORKER_IDLE)
+                except asyncio.TimeoutError:
+                    if not queue:
+                        self._chats.pop(chat_id, None)
+                        return
+                continue
+
+            factory, future, enqueued_at = queue.popleft()
+            if future.done():  # pengirim sudah batal
+                continue
+
+            for attempt in range(TG_MAX_RETRIES + 1):
+                await chat["limiter"].acquire()
+                await self.global_limiter.acquire()
+                try:
+                    result = await factory()
+                except RetryAfter as e:
+                    self.retry_after_hits += 1
+                    if attempt == TG_MAX_RETRIES:
+                        self.dropped += 1
+                        if not future.done():
+                            future.set_exception(e)
+                        break
+                    delay = retry_after_delay(e)
+                    logger.warning(f"🚦 RetryAfter {delay:.0f} detik untuk chat {chat_id}")
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception as e:
+                    # file_id cache yang kedaluwarsa sudah diharapkan dan dikirim ulang oleh pemanggil
+                    if is_stale_file_id(e):
+                        self.stale_file_ids += 1
+                    else:
+                        self.dropped += 1
+                    if not future.done():
+                        future.set_exception(e)
+                    break
+                self.sent += 1
+                self._latencies.append(time.monotonic() - enqueued_at)
+                if not future.done():
+                    future.set_result(result)
+                break
+
+    @property
+    def queue_depth(self):
+        return sum(len(chat["queue"]) for chat in self._chats.values())
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        if latencies:
+            avg = sum(latencies) / len(latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            latency = f"latensi rata-rata {avg:.2f}s, p95 {p95:.2f}s"
+        else:
+            latency = "belum ada data latensi"
+        return [
+            f"• terkirim {self.sent}, gagal {self.dropped}, file_id kedaluwarsa {self.stale_file_ids}, "
+            f"RetryAfter {self.retry_after_hits}",
+            f"• {latency}",
+            f"• antrean {self.queue_depth} di {len(self._chats)} chat, {self.global_limiter.stats()}",
+        ]
+
+dispatcher = TelegramDispatcher()
+
+async def notify(query, text, **kwargs):
+    # Balasan teks ke chat callback, lewat antrean dispatcher yang sama dengan media
+    return await dispatcher.send(
+        query.message.chat_id, lambda: query.message.reply_text(text, **kwargs)
+    )
+
+# ========== SINGLE-FLIGHT ==========
+# Request identik (operasi, target) yang datang bersamaan menunggu satu fetch yang sama
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # Fetch berjalan sebagai task sendiri agar pembatalan satu peminta
+            # tidak ikut membatalkan peminta lain
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # tandai exception sudah diambil
+
+    def stats(self):
+        return f"🔀 Single-flight: {self.calls} fetch, {self.shared} ikut menunggu, {len(self._inflight)} berjalan"
+
+singleflight = SingleFlight()
+
+# ========== JOB BERAT ==========
+# Aksi berat (story, highlight) dijalankan sebagai task di latar belakang dan
+# didaftarkan per (chat, aksi, target); tombol yang ditekan ulang saat job yang
+# sama masih berjalan tidak memulai unduhan kedua.
+HEAVY_JOBS_PER_USER = int(os.getenv("HEAVY_JOBS_PER_USER", "2"))
+
+class JobLimitError(Exception):
+    def __init__(self, running):
+        super().__init__(f"{running} job masih berjalan")
+        self.running = running
+
+# Admission control untuk job massal: maksimal MAX_RUNNING_JOBS berjalan,
+# sisanya antre sampai MAX_QUEUED_JOBS. Di atas itu, atau jika media yang sedang
+# diunduh ditambah buffer yang tertahan melewati MAX_INFLIGHT_MEDIA_BYTES, job
+# baru ditolak dengan estimasi waktu tunggu alih-alih membuat semua orang
+# menunggu tanpa batas. Batas ini berada di antara JOB_MEDIA_MAX_BYTES (satu job
+# sendirian tidak boleh memicu penolakan) dan PREFETCH_MAX_BYTES (di titik itu
+# prefetch sudah berhenti dan job baru hanya ikut menunggu).
+MAX_RUNNING_JOBS = int(os.getenv("MAX_RUNNING_JOBS", "8"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "16"))
+MAX_INFLIGHT_MEDIA_BYTES = int(os.getenv("MAX_INFLIGHT_MEDIA_BYTES", str(48 * 1024 * 1024)))
+
+class OverloadedError(Exception):
+    def __init__(self, reason, retry_in):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_in = retry_in
+
+class AdmissionControl:
+    def __init__(self, max_running, max_queued, max_media_bytes):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_media_bytes = max_media_bytes
+        self.running = 0
+        self.queued = 0
+        self._slots = asyncio.Semaphore(max_running)
+        self._avg_duration = 30.0  # EWMA durasi job, detik
+        self.admitted = 0
+        self.rejected = {"antrean penuh": 0, "memori media penuh": 0}
+
+    def estimated_wait(self, position=None):
+        if position is None:
+            position = self.queued + 1
+        if self.running < self.max_running and position <= 1:
+            return 0
+        rounds = -(-position // self.max_running)
+        return int(rounds * self._avg_duration)
+
+    def admit(self):
+        # Dipanggil sebelum job dibuat; mengembalikan posisi antrean (0 = langsung jalan)
+        if self.queued >= self.max_queued:
+            reason = "antrean penuh"
+        elif media_budget.total >= self.max_media_bytes:
+            reason = "memori media penuh"
+        else:
+            self.admitted += 1
+            self.queued += 1
+            return 0 if self.running < self.max_running else self.queued
+        self.rejected[reason] += 1
+        raise OverloadedError(reason, self.estimated_wait())
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._slots.release()
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+
+    def stats(self):
+        rejected = ", ".join(f"{reason} {count}" for reason, count in self.rejected.items())
+        return (
+            f"🚧 Admission: {self.running}/{self.max_running} berjalan, "
+            f"{self.queued}/{self.max_queued} antre, {self.admitted} diterima, ditolak: {rejected}"
+        )
+
+admission = AdmissionControl(MAX_RUNNING_JOBS, MAX_QUEUED_JOBS, MAX_INFLIGHT_MEDIA_BYTES)
+
+class JobRegistry:
+    def __init__(self, per_user):
+        self.per_user = per_user
+        self._jobs = {}  # (chat_id, aksi, target) -> task
+        self._user_jobs = {}  # user_id -> jumlah job berjalan
+        self.started = 0
+        self.deduped = 0
+        self.rejected = 0
+
+    def running(self, key):
+        task = self._jobs.get(key)
+        if task is not None and not task.done():
+            self.deduped += 1
+            return task
+        return None
+
+    def start(self, key, user_id, coro, priority="bulk"):
+        # Mengembalikan posisi antrean admission (0 = langsung jalan)
+        running = self._user_jobs.get(user_id, 0)
+        if running >= self.per_user:
+            self.rejected += 1
+            coro.close()
+            raise JobLimitError(running)
+
+        # Job interactive tidak melewati admission agar tetap responsif
+        admitted = priority != "interactive"
+        position = 0
+        if admitted:
+            try:
+                position = admission.admit()
+            except OverloadedError:
+                coro.close()
+                raise
+
+        task = asyncio.create_task(self._run(key, coro, priority, admitted))
+        self._jobs[key] = task
+        self._user_jobs[user_id] = running + 1
+        self.started += 1
+        task.add_done_callback(lambda t: self._done(key, user_id, t))
+        return position
+
+    async def _run(self, key, coro, priority, admitted):
+        work_class.set(priority)  # hanya berlaku di dalam task ini
+        try:
+            if admitted:
+                async with admission.slot():
+                    await coro
+            else:
+                await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job {key[1]} gagal: {str(e)}", exc_info=True)
+
+    def _done(self, key, user_id, task):
+        if self._jobs.get(key) is task:
+            del self._jobs[key]
+        remaining = self._user_jobs.get(user_id, 0) - 1
+        if remaining > 0:
+            self._user_jobs[user_id] = remaining
+        else:
+            self._user_jobs.pop(user_id, None)
+
+    def stats(self):
+        return (
+            f"🧵 Job berat: {len(self._jobs)} berjalan, {self.started} dimulai, "
+            f"{self.deduped} tekan ulang diabaikan, {self.rejected} ditolak (batas {self.per_user}/user)"
+        )
+
+job_registry = JobRegistry(HEAVY_JOBS_PER_USER)
+
+# ========== CACHE ==========
+# Cache LRU dengan TTL dan batas memori; hanya diakses dari event loop
+class TTLCache:
+    def __init__(self, name, ttl, max_entries, max_bytes=None, sizeof=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < time.monotonic():
+            # Entri kadaluarsa tetap disimpan sampai tergusur LRU untuk get_stale
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def get_stale(self, key):
+        # Dipakai saat circuit breaker terbuka: data lama lebih baik daripada gagal
+        entry = self._data.get(key)
+        return entry[2] if entry else None
+
+    def put(self, key, value):
+        if key in self._data:
+            self._drop(key)
+        size = self._sizeof(value)
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            self._drop(next(iter(self._data)))
+
+    def pop(self, key):
+        if key in self._data:
+            self._drop(key)
+
+    def _drop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        return (
+            f"{self.name}: {len(self._data)} entri, {self._bytes // 1024} KB, "
+            f"hit {self.hits}, miss {self.misses}"
+        )
+
+class ProfileCache(TTLCache):
+    # Key username (lowercase); cache yang butuh userid (highlight) memakai
+    # profile.userid dari entri di sini
+    def get(self, username):
+        return super().get(username.lower())
+
+    def get_stale(self, username):
+        return super().get_stale(username.lower())
+
+    def put(self, profile):
+        super().put(profile.username.lower(), profile)
+
+    def pop(self, username):
+        super().pop(username.lower())
+
+def profile_size(profile):
+    # Perkiraan ukuran memori dari metadata mentah GraphQL
+    return len(json.dumps(profile._node, default=str))
+
+profile_cache = ProfileCache(
+    "profil",
+    ttl=int(os.getenv("PROFILE_CACHE_TTL", "600")),
+    max_entries=int(os.getenv("PROFILE_CACHE_MAX", "500")),
+    max_bytes=int(os.getenv("PROFILE_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    sizeof=profile_size
 )
 
-try:
-    # Buat cookie jar
-    cookie_jar = RequestsCookieJar()
-    cookies = {
+async def get_profile(chat_id, username):
+    profile = profile_cache.get(username)
+    if profile is not None and not account_pool.usable(profile._context):
+        # Terikat ke akun yang diistirahatkan: ambil ulang lewat akun sehat
+        profile_cache.pop(username)
+        profile = None
+    if profile is None:
+        async def fetch():
+            fetched = await ig_call(
+                chat_id, lambda L: Profile.from_username(L.context, username), endpoint="profile"
+            )
+            profile_cache.put(fetched)
+            return fetched
+        try:
+            profile = await singleflight.do(("profile", username.lower()), fetch)
+        except CircuitOpenError:
+            profile = profile_cache.get_stale(username)
+            if profile is None:
+                raise
+            logger.info(f"♻️ Circuit terbuka, memakai data profil lama @{username}")
+    return profile
+
+# Index highlight per profil: userid -> {"order": [id, ...], "by_id": {id: entry}}
+highlight_cache = TTLCache(
+    "highlight",
+    ttl=int(os.getenv("HIGHLIGHT_CACHE_TTL", "900")),
+    max_entries=int(os.getenv("HIGHLIGHT_CACHE_MAX", "200"))
+)
+
+def build_highlight_index(highlights):
+    index = {"order": [], "by_id": {}}
+    for h in highlights:
+        index["order"].append(h.unique_id)
+        index["by_id"][h.unique_id] = {
+            "title": h.title,
+            # itemcount instaloader memicu request tambahan, diisi saat item diambil
+            "itemcount": None,
+            "cover": h._node.get("cover_media", {}).get("thumbnail_src"),
+            "highlight": h
+        }
+    return index
+
+def highlight_index_usable(index):
+    return all(account_pool.usable(entry["highlight"]._context) for entry in index["by_id"].values())
+
+async def get_highlight_index(chat_id, profile):
+    index = highlight_cache.get(profile.userid)
+    if index is not None and not highlight_index_usable(index):
+        # Highlight terikat ke akun yang diistirahatkan: ambil ulang lewat akun sehat
+        highlight_cache.pop(profile.userid)
+        index = None
+    if index is None:
+        async def fetch():
+            highlights = await ig_call(chat_id, fetch_highlights, profile, endpoint="highlights")
+            fetched = build_highlight_index(highlights)
+            highlight_cache.put(profile.userid, fetched)
+            return fetched
+        try:
+            index = await singleflight.do(("highlights", profile.userid), fetch)
+        except CircuitOpenError:
+            index = highlight_cache.get_stale(profile.userid)
+            if index is None:
+                raise
+            logger.info(f"♻️ Circuit terbuka, memakai daftar highlight lama {profile.userid}")
+    return index
+
+# ========== FILE_ID CACHE ==========
+# Media yang sudah pernah diupload cukup dikirim ulang lewat file_id Telegram.
+# Disimpan ke JSON agar tetap berlaku setelah restart.
+class FileIdCache:
+    def __init__(self, path, max_entries, flush_interval):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._data = OrderedDict()  # key -> {"file_id", "size"}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._data.update(data.get("entries", {}))
+            self.bytes_saved = data.get("bytes_saved", 0)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ Gagal memuat cache file_id: {str(e)}")
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def record_hit(self, entry):
+        self.hits += 1
+        self.bytes_saved += entry.get("size", 0)
+        self._mark_dirty()
+
+    def put(self, key, file_id, size):
+        self._data[key] = {"file_id": file_id, "size": size}
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        self._mark_dirty()
+
+    def pop(self, key):
+        if self._data.pop(key, None) is not None:
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self._data, "bytes_saved": self.bytes_saved}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"❌ Gagal menyimpan cache file_id: {str(e)}")
+        self._last_flush = time.monotonic()
+
+    def stats(self):
+        return (
+            f"file_id: {len(self._data)} entri, hit {self.hits}, miss {self.misses}, "
+            f"hemat {self.bytes_saved / (1024 * 1024):.1f} MB"
+        )
+
+file_id_cache = FileIdCache(
+    os.getenv("FILE_ID_CACHE_FILE", "file_id_cache.json"),
+    max_entries=int(os.getenv("FILE_ID_CACHE_MAX", "5000")),
+    flush_interval=int(os.getenv("FILE_ID_CACHE_FLUSH", "30"))
+)
+
+def message_file_id(message):
+    if message.video:
+        return message.video.file_id
+    if message.photo:
+        return message.photo[-1].file_id
+    return message.document.file_id
+
+def profile_pic_key(url):
+    # Query string CDN berubah-ubah, path file-nya yang stabil
+    return "pp:" + hashlib.sha1(urlparse(url).path.encode()).hexdigest()
+
+# ========== CIRCUIT BREAKER ==========
+# Satu breaker per endpoint. Setelah gagal berturut-turut (atau langsung pada 429)
+# circuit terbuka dengan backoff eksponensial + jitter; setelah itu satu request
+# probe (half-open) menentukan apakah circuit ditutup lagi.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_BASE_DELAY = float(os.getenv("CIRCUIT_BASE_DELAY", "30"))
+CIRCUIT_MAX_DELAY = float(os.getenv("CIRCUIT_MAX_DELAY", "900"))
+# Request yang menunggu circuit lebih lama dari ini langsung ditolak
+CIRCUIT_QUEUE_MAX_WAIT = float(os.getenv("CIRCUIT_QUEUE_MAX_WAIT", "20"))
+
+class CircuitOpenError(Exception):
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"Circuit {endpoint} terbuka, coba lagi dalam {retry_in:.0f} detik")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+def is_throttle_error(error):
+    # Error yang menandakan Instagram/CDN menolak kita, bukan kesalahan input
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    if isinstance(error, QueryReturnedNotFoundException):
+        return False
+    return isinstance(error, (
+        ConnectionException,
+        QueryReturnedBadRequestException,
+        LoginRequiredException,
+        requests.ConnectionError,
+        requests.Timeout
+    ))
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.state = "closed"
+        self.failures = 0
+        self.opens = 0
+        self.opened_until = 0
+        self.probing = False
+        self.queued = 0
+
+    async def wait_ready(self):
+        deadline = time.monotonic() + CIRCUIT_QUEUE_MAX_WAIT
+        while True:
+            now = time.monotonic()
+            if self.state == "closed":
+                return
+            if self.state == "open" and now >= self.opened_until:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return
+
+            wait = self.opened_until - now if self.state == "open" else 1.0
+            if now + wait > deadline:
+                raise CircuitOpenError(self.endpoint, max(wait, 1.0))
+            self.queued += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.queued -= 1
+
+    def on_success(self):
+        if self.state != "closed":
+            logger.info(f"✅ Circuit {self.endpoint} ditutup kembali")
+        self.state = "closed"
+        self.failures = 0
+        self.opens = 0
+        self.probing = False
+
+    def on_failure(self, error):
+        if getattr(error, "account_scoped", False):
+            # Sudah ditangani pool akun (akunnya diistirahatkan) dan masih ada akun
+            # sehat lain; endpoint tidak ikut ditutup untuk semua akun
+            self.probing = False
+            return
+        if not is_throttle_error(error):
+            # Instagram tetap menjawab (mis. profil tidak ada), endpoint sehat
+            self.on_success()
+            return
+
+        self.failures += 1
+        self.probing = False
+        if (
+            self.state == "half_open"
+            or self.failures >= CIRCUIT_FAILURE_THRESHOLD
+            or isinstance(error, TooManyRequestsException)
+            or retry_after_seconds(error) is not None
+        ):
+            delay = retry_after_seconds(error)
+            if delay is None:
+                delay = min(CIRCUIT_MAX_DELAY, CIRCUIT_BASE_DELAY * 2 ** self.opens)
+                delay *= random.uniform(0.8, 1.2)
+            self.opens += 1
+            self.state = "open"
+            self.opened_until = time.monotonic() + delay
+            logger.warning(f"🔌 Circuit {self.endpoint} terbuka {delay:.0f} detik: {str(error)}")
+
+    def on_cancel(self):
+        self.probing = False
+
+    def stats(self):
+        state = self.state
+        if state == "open":
+            state += f" {max(0, self.opened_until - time.monotonic()):.0f}s"
+        return f"• {self.endpoint}: {state}, gagal {self.failures}, antre {self.queued}"
+
+breakers = {}
+
+def get_breaker(endpoint):
+    breaker = breakers.get(endpoint)
+    if breaker is None:
+        breaker = breakers[endpoint] = CircuitBreaker(endpoint)
+    return breaker
+
+def circuit_open_text(error):
+    return f"⏳ Instagram sedang membatasi akses, coba lagi dalam {int(error.retry_in)} detik"
+
+async def guarded(endpoint, call):
+    # Jalankan coroutine `call()` di bawah circuit breaker endpoint
+    breaker = get_breaker(endpoint)
+    await breaker.wait_ready()
+    try:
+        result = await call()
+    except asyncio.CancelledError:
+        breaker.on_cancel()
+        raise
+    except Exception as e:
+        breaker.on_failure(e)
+        raise
+    breaker.on_success()
+    return result
+
+# ========== INSTAGRAM SETUP ==========
+# Akun utama dari .env, akun tambahan dari INSTAGRAM_ACCOUNTS_FILE (list JSON berisi
+# username, sessionid, ds_user_id, csrftoken, rur, mid)
+ACCOUNTS_FILE = os.getenv("INSTAGRAM_ACCOUNTS_FILE", "accounts.json")
+# Lama akun diistirahatkan setelah 429 / checkpoint (detik)
+ACCOUNT_COOLDOWN_429 = int(os.getenv("ACCOUNT_COOLDOWN_429", "600"))
+ACCOUNT_COOLDOWN_CHECKPOINT = int(os.getenv("ACCOUNT_COOLDOWN_CHECKPOINT", "3600"))
+# Cookie tiap akun disimpan di sini agar restart tidak perlu login ulang
+SESSION_DIR = os.getenv("INSTAGRAM_SESSION_DIR", "sessions")
+# Target waktu dari start proses sampai bot siap menerima update (detik)
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "1.0"))
+
+class PoolRateController(RateController):
+    # 429 langsung dilempar agar akun bisa diistirahatkan dan request dialihkan,
+    # bukan ditunggu di dalam thread instaloader
+    def handle_429(self, query_type):
+        raise TooManyRequestsException(f"429 Too Many Requests ({query_type})")
+
+def create_loader():
+    return Instaloader(
+        user_agent=random.choice(USER_AGENTS),
+        sleep=True,
+        quiet=True,
+        request_timeout=30,
+        dirname_pattern="{target}",
+        filename_pattern="{date_utc}_UTC_{profile}",
+        download_pictures=True, download_videos=True,
+        download_video_thumbnails=False, download_geotags=False,
+        post_metadata_txt_pattern="",
+        storyitem_metadata_txt_pattern="",
+        compress_json=False, download_comments=False,
+        rate_controller=lambda context: PoolRateController(context)
+    )
+
+def load_account_configs():
+    accounts = [{
+        "username": env_vars['INSTAGRAM_USERNAME'],
         "sessionid": env_vars['INSTAGRAM_SESSIONID'],
         "ds_user_id": env_vars['INSTAGRAM_DS_USER_ID'],
         "csrftoken": env_vars['INSTAGRAM_CSRFTOKEN'],
         "rur": env_vars['INSTAGRAM_RUR'],
         "mid": env_vars['INSTAGRAM_MID']
-    }
-
-    # Tambahkan cookies ke session
-    for name, value in cookies.items():
-        cookie_jar.set(name, value, domain='.instagram.com', path='/')
-
-    loader.context._session.cookies = cookie_jar
-    loader.context.username = env_vars['INSTAGRAM_USERNAME']
-
-    # Verifikasi session
-    test_profile = Profile.from_username(loader.context, env_vars['INSTAGRAM_USERNAME'])
-    logger.info(f"✅ Login berhasil sebagai: {test_profile.full_name}")
-
-except Exception as e:
-    logger.error(f"❌ Gagal login: {str(e)}")
-    exit(1)
+    }]
+    if os.path.exists(ACCOUNTS_FILE):
+        try:
+            with open(ACCOUNTS_FILE, "r", encoding="utf-8") as f:
+                for account in json.load(f):
+                    account = {key: clean_cookie_value(str(value)) for key, value in account.items()}
+                    if account.get("username") not in {a["username"] for a in accounts}:
+                        accounts.append(account)
+        except Exception as e:
+            logger.error(f"❌ Gagal memuat {ACCOUNTS_FILE}: {str(e)}")
+    return accounts
+
+class Account:
+    def __init__(self, config):
+        self.username = config["username"]
+        self.loader = create_loader()
+        self.limiter = TokenBucket(
+            f"ig:{self.username}",
+            rate=float(os.getenv("IG_RATE", "0.5")),
+            capacity=int(os.getenv("IG_BURST", "3"))
+        )
+        self.health = 1.0
+        self.inflight = 0
+        self.sidelined_until = 0
+        self.failures = 0
+        self.session_file = os.path.join(SESSION_DIR, f"session-{self.username}")
+        self.load_session(config)
+
+    def load_session(self, config):
+        # Pakai session tersimpan (tanpa request jaringan) selama sessionid-nya
+        # masih sama dengan konfigurasi; jika tidak, bangun dari cookie konfigurasi
+        if os.path.exists(self.session_file):
+            try:
+                self.loader.load_session_from_file(self.username, self.session_file)
+                if self.loader.context._session.cookies.get("sessionid") == config["sessionid"]:
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ Session {self.username} tidak bisa dimuat: {str(e)}")
+
+        # Buat cookie jar
+        cookie_jar = RequestsCookieJar()
+        for name in ("sessionid", "ds_user_id", "csrftoken", "rur", "mid"):
+            cookie_jar.set(name, config[name], domain='.instagram.com', path='/')
+        self.loader.context._session.cookies = cookie_jar
+        self.loader.context.username = self.username
+        self.save_session()
+
+    def save_session(self):
+        try:
+            os.makedirs(SESSION_DIR, exist_ok=True)
+            self.loader.save_session_to_file(self.session_file)
+        except Exception as e:
+            logger.error(f"❌ Gagal menyimpan session {self.username}: {str(e)}")
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.sidelined_until
+
+    def load(self):
+        # Skor beban: makin kecil makin diprioritaskan
+        return (self.inflight + self.limiter.queue_depth + 1) / self.health
+
+    def sideline(self, seconds, reason):
+        self.sidelined_until = time.monotonic() + seconds
+        logger.warning(f"⛔ Akun {self.username} diistirahatkan {seconds} detik: {reason}")
+
+class NoHealthyAccountError(Exception):
+    pass
+
+class AccountSidelinedError(CircuitOpenError):
+    # Objek (Profile, Highlight) terikat ke akun yang sedang diistirahatkan.
+    # Ditampilkan seperti circuit terbuka; account_scoped agar breaker endpoint
+    # tidak menganggapnya sukses maupun gagal
+    account_scoped = True
+
+    def __init__(self, username, retry_in):
+        Exception.__init__(self, f"Akun {username} sedang diistirahatkan, coba lagi dalam {retry_in:.0f} detik")
+        self.endpoint = None
+        self.retry_in = retry_in
+
+def is_checkpoint_error(error):
+    if isinstance(error, LoginRequiredException):
+        return True
+    text = str(error).lower()
+    return any(word in text for word in ("checkpoint", "challenge", "feedback_required", "login_required"))
+
+def is_account_error(error):
+    # Error yang melekat pada satu akun, bukan pada endpoint
+    return isinstance(error, TooManyRequestsException) or is_checkpoint_error(error)
+
+class AccountPool:
+    def __init__(self, accounts):
+        self.accounts = accounts
+        self._by_context = {id(account.loader.context): account for account in accounts}
+
+    def acquire(self, pin=None):
+        # pin: context instaloader milik objek (Highlight, Profile) yang harus dipakai.
+        # Akun yang diistirahatkan tidak boleh dipakai, meski objeknya terikat ke sana
+        account = self._by_context.get(id(pin)) if pin is not None else None
+        if account is not None and not account.available:
+            raise AccountSidelinedError(account.username, max(1.0, account.sidelined_until - time.monotonic()))
+        if account is None:
+            candidates = [a for a in self.accounts if a.available]
+            if not candidates:
+                raise NoHealthyAccountError("Semua akun Instagram sedang diistirahatkan")
+            account = min(candidates, key=lambda a: a.load())
+        account.inflight += 1
+        return account
+
+    def release(self, account):
+        account.inflight -= 1
+
+    def usable(self, context):
+        # False jika context milik akun yang sedang diistirahatkan
+        account = self._by_context.get(id(context))
+        return account is None or account.available
+
+    def has_available(self):
+        return any(account.available for account in self.accounts)
+
+    def report_success(self, account):
+        account.health = min(1.0, account.health + 0.05)
+        account.failures = 0
+
+    def report_failure(self, account, error):
+        if isinstance(error, TooManyRequestsException):
+            account.failures += 1
+            account.health = max(0.1, account.health * 0.5)
+            account.sideline(ACCOUNT_COOLDOWN_429 * account.failures, "429 Too Many Requests")
+        elif is_checkpoint_error(error):
+            account.failures += 1
+            account.health = max(0.1, account.health * 0.25)
+            account.sideline(ACCOUNT_COOLDOWN_CHECKPOINT, str(error))
+
+    @property
+    def queue_depth(self):
+        return sum(account.limiter.queue_depth for account in self.accounts)
+
+    def stats(self):
+        lines = []
+        for account in self.accounts:
+            state = "aktif" if account.available else (
+                f"istirahat {int(account.sidelined_until - time.monotonic())}s"
+            )
+            lines.append(
+                f"• {account.username}: {state}, health {account.health:.2f}, "
+                f"berjalan {account.inflight}, {account.limiter.stats()}"
+            )
+        return lines
+
+account_pool = AccountPool([Account(config) for config in load_account_configs()])
+
+async def ig_call(chat_id, func, *args, pin=None, endpoint="instagram", **kwargs):
+    # Semua request ke Instagram lewat sini: cek circuit endpoint, pilih akun paling
+    # longgar, tunggu token akun tersebut, lalu jalankan func(loader_akun, ...) di executor.
+    # 429/checkpoint ditangani pool per akun; circuit endpoint hanya dibuka jika
+    # tidak ada akun sehat tersisa. endpoint=None melewati circuit breaker.
+    async def call():
+        for attempt in range(2):
+            account = account_pool.acquire(pin)
+            try:
+                await account.limiter.acquire()
+                result = await run_blocking(chat_id, func, account.loader, *args, **kwargs)
+                account_pool.report_success(account)
+                return result
+            except Exception as e:
+                account_pool.report_failure(account, e)
+                if not is_account_error(e) or not account_pool.has_available():
+                    raise
+                if attempt == 0 and pin is None and isinstance(e, TooManyRequestsException):
+                    # Akun yang kena 429 sudah diistirahatkan, ulangi sekali di akun lain
+                    logger.info(f"🔁 {endpoint}: 429 di {account.username}, dicoba di akun lain")
+                    continue
+                e.account_scoped = True
+                raise
+            finally:
+                account_pool.release(account)
+
+    if endpoint is None:
+        return await call()
+    return await guarded(endpoint, call)
+
+async def validate_accounts():
+    # Verifikasi session tiap akun di background setelah bot mulai polling.
+    # Hanya session yang tidak berlaku (checkpoint/login) yang diistirahatkan;
+    # 429 sudah ditangani report_failure, error jaringan dibiarkan
+    for account in account_pool.accounts:
+        try:
+            test_profile = await ig_call(
+                "startup",
+                lambda L: Profile.from_username(L.context, L.context.username),
+                pin=account.loader.context,
+                endpoint=None  # cek akun, sesi kedaluwarsa tidak boleh membuka circuit "profile"
+            )
+            profile_cache.put(test_profile)
+            logger.info(f"✅ Login berhasil sebagai: {test_profile.full_name} ({account.username})")
+        except Exception as e:
+            logger.error(f"❌ Gagal login {account.username}: {str(e)}")
+            if is_checkpoint_error(e) and account.available:
+                account.sideline(ACCOUNT_COOLDOWN_CHECKPOINT, "gagal login")
+
+    if not any(account.available for account in account_pool.accounts):
+        logger.error("❌ Tidak ada akun Instagram yang berhasil login")
+
+# ========== HTTP CLIENT CDN ==========
+# Satu session dengan connection pool (keep-alive) untuk semua unduhan CDN,
+# dipakai bersama oleh semua handler dan thread executor
+CDN_POOL_HOSTS = int(os.getenv("CDN_POOL_HOSTS", "10"))
+CDN_POOL_PER_HOST = int(os.getenv("CDN_POOL_PER_HOST", str(IG_WORKERS)))
+
+class CdnClient:
+    def __init__(self, pool_hosts, pool_per_host):
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_hosts,
+            pool_maxsize=pool_per_host,
+            pool_block=True  # tunggu koneksi bebas, jangan buka koneksi baru di luar batas
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    async def fetch(self, chat_id, url, cancel=None, budget=None):
+        async def call():
+            await cdn_limiter.acquire()
+            return await run_blocking(chat_id, fetch_media, url, cancel=cancel, budget=budget or media_budget)
+        return await guarded("cdn", call)
+
+    def pool_stats(self):
+        # miss = koneksi TCP+TLS baru, hit = request yang memakai ulang koneksi
+        total_requests = 0
+        total_connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+        return total_requests - total_connections, total_connections
+
+    def stats(self):
+        hits, misses = self.pool_stats()
+        return f"🌐 Pool CDN: hit {hits}, miss {misses}"
+
+cdn_client = CdnClient(CDN_POOL_HOSTS, CDN_POOL_PER_HOST)
+
+# ========== FUNGSI BLOCKING INSTAGRAM ==========
+# Dipanggil lewat ig_call dengan Instaloader milik akun yang terpilih
+def fetch_story_items(L, userid):
+    items = []
+    for story in L.get_stories([userid]):
+        items.extend(story.get_items())
+    return items
+
+def fetch_highlights(L, profile):
+    return list(L.get_highlights(user=profile))
+
+# Media di-stream dari CDN ke buffer (RAM, pindah ke disk jika melebihi
+# MEDIA_SPOOL_BYTES) tanpa direktori sementara
+MAX_MEDIA_BYTES = 50 * 1024 * 1024
+MEDIA_SPOOL_BYTES = int(os.getenv("MEDIA_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+class MediaTooLargeError(Exception):
+    pass
+
+class DownloadCancelledError(Exception):
+    pass
+
+def media_url(item):
+    return (item.video_url or item.url) if item.is_video else item.url
+
+def fetch_media(url, max_bytes=MAX_MEDIA_BYTES, cancel=None, budget=None):
+    # cancel: threading.Event; dicek tiap chunk agar unduhan yang dihentikan
+    # tidak terus memakai bandwidth di thread worker.
+    # budget: MemoryBudget; ukuran unduhan dicatat sejak header diterima
+    response = cdn_client.get(url, headers=get_random_headers(), stream=True, timeout=30)
+    reserved = 0
+    try:
+        response.raise_for_status()
+        expected = int(response.headers.get("Content-Length") or 0)
+        if expected > max_bytes:
+            raise MediaTooLargeError(url)
+        if budget is not None:
+            budget.start_download(expected)
+            reserved = expected
+
+        buf = tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_BYTES)
+        try:
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelledError(url)
+                size += len(chunk)
+                if size > max_bytes:
+                    raise MediaTooLargeError(url)
+                if budget is not None and size > reserved:
+                    # Tanpa Content-Length (atau header keliru): catat sambil jalan
+                    budget.start_download(size - reserved)
+                    reserved = size
+                buf.write(chunk)
+        except BaseException:
+            buf.close()
+            raise
+        buf.seek(0)
+        return buf
+    finally:
+        if reserved:
+            budget.finish_download(reserved)
+        response.close()
+
+def buffer_size(buf):
+    size = buf.seek(0, os.SEEK_END)
+    buf.seek(0)
+    return size
 
 # ========== BOT HANDLERS ==========
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -167,24 +1405,73 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         logger.error(f"Error: {str(e)}", exc_info=True)
         await update.message.reply_text("⚠️ Terjadi kesalahan, coba lagi nanti")
 
+def heavy_job(query, username):
+    """Kembalikan (kunci job, coroutine) untuk tombol berat, atau None."""
+    chat_id = query.message.chat_id
+    if query.data == 'story':
+        return (chat_id, "story", username), handle_stories(query, username)
+    if query.data == 'highlights':
+        return (chat_id, "highlights", username), handle_highlights(query, username, page=0)
+    if query.data.startswith('highlight_'):
+        highlight_id = query.data.split('_')[1]
+        return (chat_id, "highlight", highlight_id), handle_highlight_items(query, username, highlight_id)
+    if query.data.startswith('job_resume_'):
+        job = delivery_jobs.get(query.data[len('job_resume_'):])
+        if job is not None and job.key[0] == chat_id:
+            return job.key, run_delivery(query, chat_id, job)
+    return None
+
+async def start_heavy_job(query, username):
+    job = heavy_job(query, username)
+    if job is None:
+        return False
+    key, coro = job
+
+    if job_registry.running(key):
+        coro.close()
+        await query.answer("⏳ Permintaan ini masih diproses, tunggu sebentar")
+        return True
+
+    try:
+        # Daftar highlight hanya satu request ringan, sisanya unduhan massal
+        priority = "interactive" if key[1] == "highlights" else "bulk"
+        position = job_registry.start(key, query.from_user.id, coro, priority)
+    except JobLimitError as e:
+        await query.answer(f"⏳ {e.running} permintaan Anda masih berjalan, tunggu hingga selesai", show_alert=True)
+        return True
+    except OverloadedError as e:
+        logger.warning(f"Job {key[1]} ditolak: {e.reason}")
+        await query.answer(
+            f"🚧 Bot sedang sibuk ({e.reason}), coba lagi dalam ~{max(e.retry_in, 10)} detik",
+            show_alert=True
+        )
+        return True
+
+    if position:
+        await query.answer(f"⏳ Masuk antrean ke-{position}, estimasi ~{admission.estimated_wait(position)} detik")
+    else:
+        await query.answer()
+    return True
+
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
-    await query.answer()
 
     username = context.user_data.get('current_profile')
     if not username:
+        await query.answer()
         await query.edit_message_text("❌ Session expired, silakan kirim URL lagi")
         return
 
     try:
-        if query.data == 'profile_pic':
-            await handle_profile_pic(query, username)
+        # Job berat jalan di latar belakang agar update berikutnya dari chat
+        # ini (termasuk tekan ulang) tidak tertahan di antrean per chat
+        if await start_heavy_job(query, username):
+            return
 
-        elif query.data == 'story':
-            await handle_stories(query, username)
+        await query.answer()
 
-        elif query.data == 'highlights':
-            await handle_highlights(query, username, page=0)
+        if query.data == 'profile_pic':
+            await handle_profile_pic(query, username)
 
         elif query.data.startswith('highlights_next_'):
             next_page = int(query.data.split('_')[2])
@@ -197,9 +1484,11 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         elif query.data == 'profile_info':
             await handle_profile_info(query, username)
 
-        elif query.data.startswith('highlight_'):
-            highlight_id = query.data.split('_')[1]
-            await handle_highlight_items(query, username, highlight_id)
+        elif query.data.startswith('job_stop_'):
+            await stop_delivery(query, query.data[len('job_stop_'):])
+
+        elif query.data.startswith('job_resume_'):
+            await notify(query, "❌ Job sudah kedaluwarsa, silakan mulai ulang")
 
         elif query.data == 'export_followers':
             await export_followers(query, username)
@@ -218,176 +1507,566 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text("⚠️ Gagal memproses permintaan")
 
 async def handle_profile_pic(query, username):
+    chat_id = query.message.chat_id
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await get_profile(chat_id, username)
 
         if profile.is_private and not profile.followed_by_viewer:
-            await query.message.reply_text("🔒 Profil privat - Anda belum follow akun ini")
+            await notify(query, "🔒 Profil privat - Anda belum follow akun ini")
             return
 
-        # Dapatkan URL HD
-        hd_url = profile.profile_pic_url.replace("/s150x150/", "/s1080x1080/")
+        # Dapatkan URL HD; profile_pic_url memicu request tambahan, jadi jalankan lewat ig_call
+        pic_url = await ig_call(
+            chat_id, lambda L: profile.profile_pic_url, pin=profile._context, endpoint="profile"
+        )
+        hd_url = pic_url.replace("/s150x150/", "/s1080x1080/")
+
+        key = profile_pic_key(hd_url)
+        cached = file_id_cache.get(key)
+        if cached:
+            try:
+                await dispatcher.send(chat_id, lambda: query.message.reply_document(
+                    document=cached["file_id"],
+                    caption=f"📸 Foto Profil @{username}"
+                ))
+                file_id_cache.record_hit(cached)
+                return
+            except BadRequest:
+                file_id_cache.pop(key)
+
+        # Stream gambar ke buffer, lalu kirim sebagai dokumen
+        buf = await cdn_client.fetch(chat_id, hd_url)
+        size = buffer_size(buf)
+        media_budget.add(size)
+        try:
+            def send():
+                buf.seek(0)
+                return query.message.reply_document(
+                    document=buf,
+                    filename=f"{username}_profile.jpg",
+                    caption=f"📸 Foto Profil @{username}"
+                )
+            message = await dispatcher.send(chat_id, send)
+            file_id_cache.put(key, message_file_id(message), size)
+        finally:
+            buf.close()
+            media_budget.release(size)
 
-        # Download gambar
-        response = requests.get(hd_url, headers=get_random_headers(), stream=True)
-        response.raise_for_status()
+    except CircuitOpenError as e:
+        await notify(query, circuit_open_text(e))
+    except Exception as e:
+        logger.error(f"Profile pic error: {str(e)}")
+        await notify(query, "⚠️ Gagal mengambil foto profil")
+
+async def send_story_media(query, item, media, caption, parse_mode=None):
+    # media bisa berupa buffer file atau file_id string
+    def send():
+        if hasattr(media, "seek"):
+            media.seek(0)  # buffer dibaca ulang jika dikirim ulang setelah RetryAfter
+        if item.is_video:
+            return query.message.reply_video(
+                video=media,
+                filename=f"{item.mediaid}.mp4",
+                caption=caption,
+                parse_mode=parse_mode,
+                read_timeout=60,
+                write_timeout=60
+            )
+        return query.message.reply_photo(
+            photo=media,
+            filename=f"{item.mediaid}.jpg",
+            caption=caption,
+            parse_mode=parse_mode,
+            read_timeout=60
+        )
+    return await dispatcher.send(query.message.chat_id, send)
+
+async def deliver_story_item(query, chat_id, item, caption, parse_mode=None):
+    # Pakai file_id jika media ini pernah dikirim, selain itu download dan upload
+    key = f"story:{item.mediaid}"
+    cached = file_id_cache.get(key)
+    if cached:
+        try:
+            await send_story_media(query, item, cached["file_id"], caption, parse_mode)
+            file_id_cache.record_hit(cached)
+            return
+        except BadRequest:
+            file_id_cache.pop(key)
 
-        # Simpan sementara
-        temp_file = f"temp_{username}_{int(time.time())}.jpg"
-        with open(temp_file, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        # Kirim sebagai dokumen
-        await query.message.reply_document(
-            document=open(temp_file, "rb"),
-            filename=f"{username}_profile.jpg",
-            caption=f"📸 Foto Profil @{username}"
+    buf = await cdn_client.fetch(chat_id, media_url(item))
+    size = buffer_size(buf)
+    media_budget.add(size)
+    try:
+        message = await send_story_media(query, item, buf, caption, parse_mode)
+        file_id_cache.put(key, message_file_id(message), size)
+    finally:
+        buf.close()
+        media_budget.release(size)
+
+# ========== PIPELINE PENGIRIMAN ==========
+# Item berikutnya sudah diunduh (prefetch) selagi item saat ini diupload.
+# Total buffer yang tertahan dibatasi media_budget sebagai backpressure, dan
+# buffer satu job (termasuk album yang sedang dikumpulkan) dibatasi
+# JOB_MEDIA_MAX_BYTES agar satu job tidak menghabiskan budget bersama.
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "3"))
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(64 * 1024 * 1024)))
+JOB_MEDIA_MAX_BYTES = int(os.getenv("JOB_MEDIA_MAX_BYTES", str(16 * 1024 * 1024)))
+
+class MemoryBudget:
+    # used: buffer siap kirim (dicatat di event loop); inflight: unduhan yang
+    # sedang berjalan di thread executor, dicatat dari Content-Length.
+    # Budget per job memakai parent=media_budget; semua catatan ikut diteruskan
+    def __init__(self, limit, parent=None):
+        self.limit = limit
+        self.parent = parent
+        self.used = 0
+        self.inflight = 0
+        self._lock = threading.Lock()
+        self._room = asyncio.Event()
+        self._room.set()
+
+    @property
+    def full(self):
+        return self.used >= self.limit or (self.parent is not None and self.parent.full)
+
+    @property
+    def total(self):
+        return self.used + self.inflight
+
+    def start_download(self, size):
+        with self._lock:
+            self.inflight += size
+        if self.parent is not None:
+            self.parent.start_download(size)
+
+    def finish_download(self, size):
+        with self._lock:
+            self.inflight -= size
+        if self.parent is not None:
+            self.parent.finish_download(size)
+
+    async def wait_for_room(self):
+        await self._room.wait()
+        if self.parent is not None:
+            await self.parent.wait_for_room()
+
+    def add(self, size):
+        self.used += size
+        if self.used >= self.limit:
+            self._room.clear()
+        if self.parent is not None:
+            self.parent.add(size)
+
+    def release(self, size):
+        self.used -= size
+        if self.used < self.limit:
+            self._room.set()
+        if self.parent is not None:
+            self.parent.release(size)
+
+media_budget = MemoryBudget(PREFETCH_MAX_BYTES)
+
+if admission.max_media_bytes > PREFETCH_MAX_BYTES:
+    logger.warning(
+        f"MAX_INFLIGHT_MEDIA_BYTES ({admission.max_media_bytes}) di atas PREFETCH_MAX_BYTES "
+        f"({PREFETCH_MAX_BYTES}), memakai {PREFETCH_MAX_BYTES}"
+    )
+    admission.max_media_bytes = PREFETCH_MAX_BYTES
+if admission.max_media_bytes <= JOB_MEDIA_MAX_BYTES:
+    logger.warning(
+        f"MAX_INFLIGHT_MEDIA_BYTES ({admission.max_media_bytes}) tidak di atas JOB_MEDIA_MAX_BYTES "
+        f"({JOB_MEDIA_MAX_BYTES}): satu job saja bisa membuat job lain ditolak"
+    )
+
+async def prepare_item(chat_id, item, caption, cancel=None, budget=media_budget):
+    key = f"story:{item.mediaid}"
+    prepared = {"item": item, "caption": caption, "key": key, "cached": None, "size": 0, "budget": budget}
+    cached = file_id_cache.get(key)
+    if cached:
+        prepared.update(media=cached["file_id"], cached=cached)
+        return prepared
+
+    await budget.wait_for_room()
+    buf = await cdn_client.fetch(chat_id, media_url(item), cancel=cancel, budget=budget)
+    prepared.update(media=buf, size=buffer_size(buf))
+    budget.add(prepared["size"])
+    return prepared
+
+def release_prepared(prepared):
+    if prepared.get("cached") is None and prepared.get("media") is not None:
+        prepared["media"].close()
+        prepared["budget"].release(prepared["size"])
+
+async def prefetch_items(chat_id, entries, depth=PREFETCH_DEPTH, cancel=None, budget=media_budget):
+    # Menghasilkan item siap kirim sesuai urutan, maksimal `depth` unduhan berjalan
+    pending = deque()
+    entries_iter = iter(entries)
+
+    def fill():
+        for item, caption in itertools.islice(entries_iter, depth - len(pending)):
+            pending.append((item, asyncio.ensure_future(prepare_item(chat_id, item, caption, cancel, budget))))
+
+    try:
+        fill()
+        while pending:
+            item, task = pending.popleft()
+            try:
+                prepared = await task
+            except Exception as e:
+                prepared = {"item": item, "error": e}
+            fill()
+            yield prepared
+    finally:
+        for _, task in pending:
+            task.cancel()
+        for _, task in pending:
+            if task.done() and not task.cancelled() and task.exception() is None:
+                release_prepared(task.result())
+
+async def send_prepared(query, chat_id, prepared, parse_mode=None):
+    item, caption, key = prepared["item"], prepared["caption"], prepared["key"]
+    if prepared["cached"]:
+        try:
+            await send_story_media(query, item, prepared["media"], caption, parse_mode)
+            file_id_cache.record_hit(prepared["cached"])
+        except BadRequest:
+            file_id_cache.pop(key)
+            await deliver_story_item(query, chat_id, item, caption, parse_mode)
+        return
+
+    message = await send_story_media(query, item, prepared["media"], caption, parse_mode)
+    file_id_cache.put(key, message_file_id(message), prepared["size"])
+
+async def report_prepare_error(query, prepared):
+    if isinstance(prepared["error"], MediaTooLargeError):
+        await notify(query, "⚠️ File melebihi batas 50MB")
+    else:
+        logger.error(f"Gagal mengunduh item {prepared['item'].mediaid}: {str(prepared['error'])}")
+
+# ========== PENGIRIMAN ALBUM ==========
+# "album": item dikirim per sendMediaGroup (maks 10), "single": satu per satu
+DELIVERY_MODE = os.getenv("DELIVERY_MODE", "album")
+ALBUM_SIZE = 10
+# Item di atas batas ini dikirim terpisah (batas foto Telegram 10MB)
+ALBUM_MAX_ITEM_BYTES = int(os.getenv("ALBUM_MAX_ITEM_BYTES", str(10 * 1024 * 1024)))
+
+def input_media(item, media, caption, parse_mode):
+    if item.is_video:
+        return InputMediaVideo(
+            media=media, caption=caption, parse_mode=parse_mode,
+            filename=f"{item.mediaid}.mp4", supports_streaming=True
         )
-        os.remove(temp_file)
+    return InputMediaPhoto(
+        media=media, caption=caption, parse_mode=parse_mode,
+        filename=f"{item.mediaid}.jpg"
+    )
+
+async def send_album(query, chat_id, batch, parse_mode=None):
+    # batch: list item siap kirim dari prefetch_items; mengembalikan jumlah terkirim
+    sent_count = 0
+    album = []
+    for prepared in batch:
+        if prepared["size"] > ALBUM_MAX_ITEM_BYTES:
+            # Terlalu besar untuk album, kirim terpisah
+            try:
+                await send_prepared(query, chat_id, prepared, parse_mode)
+                sent_count += 1
+            except Exception as e:
+                logger.error(f"Gagal mengirim item {prepared['item'].mediaid}: {str(e)}")
+        else:
+            album.append(prepared)
 
+    if len(album) >= 2:
+        try:
+            def send():
+                for p in album:
+                    if not p["cached"]:
+                        p["media"].seek(0)
+                return query.message.reply_media_group(
+                    media=[
+                        input_media(p["item"], p["media"], p["caption"], parse_mode)
+                        for p in album
+                    ],
+                    read_timeout=120,
+                    write_timeout=120
+                )
+            messages = await dispatcher.send(chat_id, send)
+            for prepared, message in zip(album, messages):
+                if prepared["cached"]:
+                    file_id_cache.record_hit(prepared["cached"])
+                else:
+                    file_id_cache.put(prepared["key"], message_file_id(message), prepared["size"])
+            return sent_count + len(album)
+        except Exception as e:
+            logger.warning(f"Album gagal dikirim, beralih ke kirim satu per satu: {str(e)}")
+
+    # Album hanya berisi 1 item atau gagal: kirim satu per satu
+    for prepared in album:
+        try:
+            await send_prepared(query, chat_id, prepared, parse_mode)
+            sent_count += 1
+        except MediaTooLargeError:
+            await notify(query, "⚠️ File melebihi batas 50MB")
+        except Exception as e:
+            logger.error(f"Gagal mengirim item {prepared['item'].mediaid}: {str(e)}")
+    return sent_count
+
+async def deliver_items(query, chat_id, entries, parse_mode=None, job=None):
+    # entries: list (item, caption) berurutan; mengembalikan jumlah item terkirim.
+    # Jika job diberikan, kursornya dimajukan setiap kali item selesai diproses.
+    batch_size = ALBUM_SIZE if DELIVERY_MODE == "album" else 1
+    sent_count = 0
+    consumed = 0
+    batch = []
+    cancel = job.cancel if job is not None else None
+    budget = MemoryBudget(JOB_MEDIA_MAX_BYTES, parent=media_budget)
+
+    def advance():
+        if job is not None:
+            job.advance(consumed - len(batch), sent_count)
+
+    async def flush():
+        nonlocal sent_count
+        try:
+            if batch_size > 1:
+                sent_count += await send_album(query, chat_id, batch, parse_mode)
+            else:
+                for prepared in batch:
+                    try:
+                        await send_prepared(query, chat_id, prepared, parse_mode)
+                        sent_count += 1
+                    except MediaTooLargeError:
+                        await notify(query, "⚠️ File melebihi batas 50MB")
+                    except Exception as e:
+                        logger.error(f"Gagal mengirim item {prepared['item'].mediaid}: {str(e)}")
+        finally:
+            for prepared in batch:
+                release_prepared(prepared)
+            batch.clear()
+        advance()
+
+    try:
+        async with contextlib.aclosing(prefetch_items(chat_id, entries, cancel=cancel, budget=budget)) as prepared_items:
+            async for prepared in prepared_items:
+                consumed += 1
+                if "error" in prepared:
+                    if job is not None and isinstance(prepared["error"], CircuitOpenError):
+                        # Hentikan job di sini agar bisa dilanjutkan dari item ini
+                        consumed -= 1
+                        await flush()
+                        raise prepared["error"]
+                    await report_prepare_error(query, prepared)
+                    if not batch:
+                        advance()
+                    continue
+                batch.append(prepared)
+                # Kirim lebih awal jika budget job atau budget bersama penuh agar
+                # prefetch tidak macet menunggu buffer yang ditahan batch ini
+                if len(batch) >= batch_size or budget.full:
+                    await flush()
+        await flush()
+    finally:
+        for prepared in batch:
+            release_prepared(prepared)
+    return sent_count
+
+# ========== JOB PENGIRIMAN ==========
+# Pengiriman story/highlight berjalan sebagai job dengan kursor. Tombol ⛔ Stop
+# membatalkan unduhan yang sedang berjalan; job yang dihentikan atau gagal bisa
+# dilanjutkan dari item berikutnya tanpa mengambil ulang daftar item.
+DELIVERY_JOB_TTL = int(os.getenv("DELIVERY_JOB_TTL", "1800"))
+
+class DeliveryJob:
+    def __init__(self, key, title, entries, done_message, parse_mode=None):
+        self.id = os.urandom(4).hex()
+        self.key = key  # kunci job_registry, dipakai ulang saat dilanjutkan
+        self.title = title
+        self.entries = entries
+        self.done_message = done_message  # fungsi(jumlah terkirim) -> teks
+        self.parse_mode = parse_mode
+        self.cursor = 0
+        self.sent = 0
+        self._run_start = (0, 0)
+        self.cancel = threading.Event()
+        self.task = None
+        self.stopped = False
+        self.updated = time.monotonic()
+
+    def begin(self):
+        self._run_start = (self.cursor, self.sent)
+        self.cancel = threading.Event()
+        self.stopped = False
+        self.task = asyncio.current_task()
+
+    def advance(self, consumed, sent):
+        self.cursor = self._run_start[0] + consumed
+        self.sent = self._run_start[1] + sent
+        self.updated = time.monotonic()
+
+    def stop(self):
+        self.stopped = True
+        self.cancel.set()
+        if self.task is not None:
+            self.task.cancel()
+
+delivery_jobs = {}
+
+def purge_delivery_jobs():
+    now = time.monotonic()
+    for job_id, job in list(delivery_jobs.items()):
+        if job.task is None and now - job.updated > DELIVERY_JOB_TTL:
+            del delivery_jobs[job_id]
+
+def stop_markup(job):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("⛔ Stop", callback_data=f"job_stop_{job.id}")
+    ]])
+
+def resume_markup(job):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(f"▶️ Lanjutkan dari item {job.cursor + 1}", callback_data=f"job_resume_{job.id}")
+    ]])
+
+async def run_delivery(query, chat_id, job):
+    # Kirim item mulai dari kursor job; pesan akhir dikirim di sini baik saat
+    # selesai, dihentikan, maupun gagal
+    purge_delivery_jobs()
+    delivery_jobs[job.id] = job
+    total = len(job.entries)
+    try:
+        progress = await notify(
+            query,
+            f"🔄 Memproses item {job.cursor + 1}-{total} dari {job.title}",
+            reply_markup=stop_markup(job)
+        )
     except Exception as e:
-        logger.error(f"Profile pic error: {str(e)}")
-        await query.message.reply_text("⚠️ Gagal mengambil foto profil")
+        # Job tetap jalan tanpa pesan progres (dan tombol stop); jika terhenti,
+        # tombol lanjutkan tetap dikirim dari handler di bawah
+        logger.warning(f"Pesan progres {job.title} gagal dikirim: {str(e)}")
+        progress = None
+    job.begin()
+    try:
+        await deliver_items(query, chat_id, job.entries[job.cursor:], job.parse_mode, job=job)
+    except asyncio.CancelledError:
+        if not job.stopped:
+            raise
+        await notify(
+            query,
+            f"⛔ Dihentikan di item {job.cursor}/{total} ({job.sent} terkirim)",
+            reply_markup=resume_markup(job)
+        )
+        return
+    except CircuitOpenError as e:
+        await notify(query, circuit_open_text(e), reply_markup=resume_markup(job))
+        return
+    except Exception as e:
+        logger.error(f"Job {job.title} gagal di item {job.cursor + 1}: {str(e)}", exc_info=True)
+        await notify(
+            query,
+            f"⚠️ Pengiriman terhenti di item {job.cursor}/{total}",
+            reply_markup=resume_markup(job)
+        )
+        return
+    finally:
+        job.task = None
+        job.updated = time.monotonic()
+        if progress is not None:
+            with contextlib.suppress(Exception):
+                await dispatcher.send(chat_id, lambda: progress.edit_reply_markup(reply_markup=None))
+
+    delivery_jobs.pop(job.id, None)
+    logger.info(f"Berhasil mengirim {job.sent}/{total} item {job.title}")
+    await notify(query, job.done_message(job.sent))
+
+async def stop_delivery(query, job_id):
+    job = delivery_jobs.get(job_id)
+    if job is None or job.key[0] != query.message.chat_id or job.task is None:
+        await notify(query, "ℹ️ Pengiriman ini sudah tidak berjalan")
+        return
+    job.stop()
 
 async def handle_stories(query, username):
+    chat_id = query.message.chat_id
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await get_profile(chat_id, username)
 
         if profile.is_private and not profile.followed_by_viewer:
-            await query.message.reply_text("🔒 Profil privat - Anda belum follow akun ini")
+            await notify(query, "🔒 Profil privat - Anda belum follow akun ini")
             return
 
-        stories = []
         try:
-            for story in loader.get_stories([profile.userid]):
-                stories.extend(story.get_items())
+            stories = list(await singleflight.do(
+                ("stories", profile.userid),
+                lambda: ig_call(chat_id, fetch_story_items, profile.userid, endpoint="stories")
+            ))
         except QueryReturnedBadRequestException:
-            await query.message.reply_text("🔒 Profil privat - Bot tidak dapat mengakses story")
+            await notify(query, "🔒 Profil privat - Bot tidak dapat mengakses story")
             return
 
         # Sort stories by date (oldest first)
         stories.sort(key=lambda x: x.date_utc)
 
         if not stories:
-            await query.message.reply_text("📭 Tidak ada story yang tersedia")
+            await notify(query, "📭 Tidak ada story yang tersedia")
             return
 
         # Set time zone (contoh: Asia/Jakarta untuk WIB)
         time_zone = pytz.timezone("Asia/Jakarta")
+        time_format = "%d-%m-%Y %H:%M"
 
-        temp_dir = f"temp_{username}_{int(time.time())}"
-        os.makedirs(temp_dir, exist_ok=True)
-
-        try:
-            sent_count = 0
-            logger.info(f"🔄 Memproses {len(stories)} story untuk @{username}")
-
-            for story_item in stories:
-                try:
-                    download_success = loader.download_storyitem(story_item, temp_dir)
-                    if not download_success:
-                        logger.warning(f"Gagal mengunduh story item: {story_item.mediaid}")
-                        continue
-
-                    # Filter file media valid
-                    valid_extensions = ('.jpg', '.jpeg', '.png', '.mp4', '.mov')
-                    media_files = [
-                        f for f in glob.glob(os.path.join(temp_dir, "*"))
-                        if f.lower().endswith(valid_extensions)
-                    ]
-
-                    if not media_files:
-                        logger.warning("Tidak ada file media yang valid")
-                        continue
-
-                    # Ambil file terbaru
-                    latest_file = max(media_files, key=os.path.getmtime)
-
-                    # Validasi tipe file
-                    is_video = story_item.is_video
-                    expected_ext = ('.mp4', '.mov') if is_video else ('.jpg', '.jpeg', '.png')
-                    if not latest_file.lower().endswith(expected_ext):
-                        logger.error("Ekstensi file tidak sesuai dengan tipe konten")
-                        continue
-
-                    # Cek ukuran file
-                    file_size = os.path.getsize(latest_file)
-                    if file_size > 50 * 1024 * 1024:
-                        await query.message.reply_text("⚠️ File melebihi batas 50MB")
-                        os.remove(latest_file)
-                        continue
-
-                    # Konversi waktu UTC ke time zone yang ditentukan
-                    local_time = story_item.date_utc.replace(tzinfo=pytz.utc).astimezone(time_zone)
-                    time_format = "%d-%m-%Y %H:%M"
-
-                    try:
-                        with open(latest_file, "rb") as f:
-                            if is_video:
-                                await query.message.reply_video(
-                                    video=f,
-                                    caption=f"📹 {local_time.strftime(time_format)}",
-                                    read_timeout=60,
-                                    write_timeout=60
-                                )
-                            else:
-                                await query.message.reply_photo(
-                                    photo=f,
-                                    caption=f"📸 {local_time.strftime(time_format)}",
-                                    read_timeout=60
-                                )
-                            sent_count += 1
-                    except Exception as send_error:
-                        logger.error(f"Gagal mengirim file: {str(send_error)}")
-                    finally:
-                        if os.path.exists(latest_file):
-                            os.remove(latest_file)
-
-                    time.sleep(2)
-
-                except Exception as e:
-                    logger.error(f"Gagal mengunduh atau mengirim story: {str(e)}")
-                    continue
+        logger.info(
+            f"🔄 Memproses {len(stories)} story untuk @{username} "
+            f"(antrean IG: {account_pool.queue_depth}, antrean TG: {dispatcher.queue_depth})"
+        )
 
-            await query.message.reply_text(f"📤 Total {sent_count} story berhasil dikirim")
+        entries = []
+        for story_item in stories:
+            # Konversi waktu UTC ke time zone yang ditentukan
+            local_time = story_item.date_utc.replace(tzinfo=pytz.utc).astimezone(time_zone)
+            icon = "📹" if story_item.is_video else "📸"
+            entries.append((story_item, f"{icon} {local_time.strftime(time_format)}"))
 
-        finally:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                logger.info(f"🗑️ Direktori {temp_dir} berhasil dibersihkan")
+        job = DeliveryJob(
+            (chat_id, "story", username), f"story @{username}", entries,
+            lambda sent: f"📤 Total {sent} story berhasil dikirim"
+        )
+        await run_delivery(query, chat_id, job)
 
     except QueryReturnedBadRequestException as e:
         logger.error(f"Error API Instagram: {str(e)}")
-        await query.message.reply_text("⚠️ Akses ditolak oleh Instagram")
+        await notify(query, "⚠️ Akses ditolak oleh Instagram")
+    except CircuitOpenError as e:
+        await notify(query, circuit_open_text(e))
     except Exception as e:
         logger.error(f"Story error: {str(e)}", exc_info=True)
-        await query.message.reply_text("⚠️ Gagal mengambil story")
+        await notify(query, "⚠️ Gagal mengambil story")
 
 # ... (kode setelahnya tetap sama)
 
 async def handle_highlights(query, username, page=0):
+    chat_id = query.message.chat_id
     try:
-        profile = Profile.from_username(loader.context, username)
-        highlights = list(loader.get_highlights(user=profile))
+        profile = await get_profile(chat_id, username)
+        index = await get_highlight_index(chat_id, profile)
+        highlight_ids = index["order"]
 
-        if not highlights:
-            await query.message.reply_text("🌟 Tidak ada highlights yang tersedia")
+        if not highlight_ids:
+            await notify(query, "🌟 Tidak ada highlights yang tersedia")
             return
 
         # Pagination logic
         items_per_page = 10
         start_idx = page * items_per_page
         end_idx = start_idx + items_per_page
-        current_highlights = highlights[start_idx:end_idx]
 
         keyboard = []
-        for highlight in current_highlights:
-            title = highlight.title[:15] + "..." if len(highlight.title) > 15 else highlight.title
+        for highlight_id in highlight_ids[start_idx:end_idx]:
+            title = index["by_id"][highlight_id]["title"]
+            title = title[:15] + "..." if len(title) > 15 else title
             keyboard.append([
                 InlineKeyboardButton(
                     f"🌟 {title}",
-                    callback_data=f"highlight_{highlight.unique_id}"
+                    callback_data=f"highlight_{highlight_id}"
                 )
             ])
 
@@ -397,7 +2076,7 @@ async def handle_highlights(query, username, page=0):
             navigation_buttons.append(
                 InlineKeyboardButton("⏪ Kembali", callback_data=f"highlights_prev_{page - 1}")
             )
-        if len(highlights) > end_idx:
+        if len(highlight_ids) > end_idx:
             navigation_buttons.append(
                 InlineKeyboardButton("⏩ Lanjutkan", callback_data=f"highlights_next_{page + 1}")
             )
@@ -406,138 +2085,75 @@ async def handle_highlights(query, username, page=0):
             keyboard.append(navigation_buttons)
 
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.reply_text(
+        await notify(
+            query,
             f"Pilih highlight untuk @{username} (Halaman {page + 1}):",
             reply_markup=reply_markup
         )
 
+    except CircuitOpenError as e:
+        await notify(query, circuit_open_text(e))
     except Exception as e:
         logger.error(f"Highlights error: {str(e)}", exc_info=True)
-        await query.message.reply_text("⚠️ Gagal mengambil daftar highlight")
+        await notify(query, "⚠️ Gagal mengambil daftar highlight")
 
 async def handle_highlight_items(query, username, highlight_id):
-    temp_dir = None  # Inisialisasi variabel di scope terluar
+    chat_id = query.message.chat_id
     try:
-        profile = Profile.from_username(loader.context, username)
-        highlights = list(loader.get_highlights(user=profile))
+        profile = await get_profile(chat_id, username)
+        index = await get_highlight_index(chat_id, profile)
 
-        # Konversi highlight_id ke integer
-        highlight_id_int = int(highlight_id)
-        highlight = None
-
-        # Cari highlight
-        for h in highlights:
-            if h.unique_id == highlight_id_int:
-                highlight = h
-                break
-
-        if not highlight:
-            await query.message.reply_text("❌ Highlight tidak ditemukan")
+        # Cari highlight langsung dari index
+        entry = index["by_id"].get(int(highlight_id))
+        if not entry:
+            await notify(query, "❌ Highlight tidak ditemukan")
             return
-
-        # Buat direktori temporary
-        temp_dir = f"temp_highlight_{username}_{int(time.time())}"
-        os.makedirs(temp_dir, exist_ok=True)
-        sent_count = 0
+        highlight = entry["highlight"]
 
         # Set time zone (contoh: Asia/Jakarta untuk WIB)
         time_zone = pytz.timezone("Asia/Jakarta")
+        time_format = "%d-%m-%Y %H:%M"
 
         # Ubah generator menjadi list
-        highlight_items = list(highlight.get_items())
-
-        # Kirim pesan jumlah item yang diproses
-        await query.message.reply_text(f"🔄 Memproses {len(highlight_items)} item dari highlight '{highlight.title}'")
-
-        try:
-            for idx, item in enumerate(highlight_items, start=1):
-                # Download item
-                loader.download_storyitem(item, target=temp_dir)
-                time.sleep(3)
-
-                # Filter file media valid
-                valid_extensions = ('.jpg', '.jpeg', '.png', '.mp4', '.mov')
-                media_files = [
-                    f for f in glob.glob(os.path.join(temp_dir, "*"))
-                    if f.lower().endswith(valid_extensions)
-                ]
-
-                if not media_files:
-                    logger.warning("Tidak ada file media yang valid")
-                    continue
-
-                # Ambil file terbaru
-                latest_file = max(media_files, key=os.path.getmtime)
-
-                # Validasi tipe file
-                is_video = item.is_video
-                expected_ext = ('.mp4', '.mov') if is_video else ('.jpg', '.jpeg', '.png')
-                if not latest_file.lower().endswith(expected_ext):
-                    logger.error("Ekstensi file tidak sesuai dengan tipe konten")
-                    continue
-
-                # Cek ukuran file
-                file_size = os.path.getsize(latest_file)
-                if file_size > 50 * 1024 * 1024:
-                    await query.message.reply_text("⚠️ File melebihi batas 50MB")
-                    os.remove(latest_file)
-                    continue
-
-                # Konversi waktu UTC ke time zone yang ditentukan
-                local_time = item.date_utc.replace(tzinfo=pytz.utc).astimezone(time_zone)
-                time_format = "%d-%m-%Y %H:%M"
-
-                try:
-                    with open(latest_file, "rb") as f:
-                        if is_video:
-                            await query.message.reply_video(
-                                video=f,
-                                caption=f"**[{idx}]**.🌟 {highlight.title} - 📹 {local_time.strftime(time_format)}",
-                                parse_mode="Markdown",  # Tambahkan parse_mode di sini
-                                read_timeout=60,
-                                write_timeout=60
-                            )
-                        else:
-                            await query.message.reply_photo(
-                                photo=f,
-                                caption=f"**[{idx}]**.🌟 {highlight.title} - 📸 {local_time.strftime(time_format)}",
-                                parse_mode="Markdown",  # Tambahkan parse_mode di sini
-                                read_timeout=60
-                            )
-                        sent_count += 1
-                        logger.info(f"Berhasil mengirim {latest_file} sebagai {'video' if is_video else 'foto'}")
-                except Exception as send_error:
-                    logger.error(f"Gagal mengirim file: {str(send_error)}")
-                finally:
-                    if os.path.exists(latest_file):
-                        os.remove(latest_file)
-
-                time.sleep(1)
-
-            await query.message.reply_text(f"✅ {sent_count} item dari highlight '{highlight.title}' berhasil dikirim")
-
-        except Exception as e:
-            logger.error(f"Error saat memproses item: {str(e)}")
-            await query.message.reply_text("⚠️ Gagal memproses item highlight")
-
-        finally:
-            # Hapus direktori temporary jika ada
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                logger.info(f"Direktori {temp_dir} dihapus")
+        highlight_items = await singleflight.do(
+            ("highlight_items", highlight.unique_id),
+            lambda: ig_call(
+                chat_id, lambda L: list(highlight.get_items()),
+                pin=highlight._context, endpoint="highlight_items"
+            )
+        )
+        entry["itemcount"] = len(highlight_items)
+
+        entries = []
+        for idx, item in enumerate(highlight_items, start=1):
+            # Konversi waktu UTC ke time zone yang ditentukan
+            local_time = item.date_utc.replace(tzinfo=pytz.utc).astimezone(time_zone)
+            icon = "📹" if item.is_video else "📸"
+            entries.append((
+                item,
+                f"**[{idx}]**.🌟 {highlight.title} - {icon} {local_time.strftime(time_format)}"
+            ))
+
+        job = DeliveryJob(
+            (chat_id, "highlight", highlight_id), f"highlight '{highlight.title}'", entries,
+            lambda sent: f"✅ {sent} item dari highlight '{highlight.title}' berhasil dikirim",
+            parse_mode="Markdown"
+        )
+        await run_delivery(query, chat_id, job)
 
     except QueryReturnedBadRequestException as e:
         logger.error(f"Error API Instagram: {str(e)}")
-        await query.message.reply_text("⚠️ Akses ditolak oleh Instagram")
+        await notify(query, "⚠️ Akses ditolak oleh Instagram")
+    except CircuitOpenError as e:
+        await notify(query, circuit_open_text(e))
     except Exception as e:
         logger.error(f"Error highlight: {str(e)}", exc_info=True)
-        await query.message.reply_text("⚠️ Gagal memproses highlight")
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        await notify(query, "⚠️ Gagal memproses highlight")
 
 async def handle_profile_info(query, username):
+    chat_id = query.message.chat_id
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await get_profile(chat_id, username)
 
         info_text = (
             f"📊 Info Profil @{username}:\n"
@@ -550,16 +2166,182 @@ async def handle_profile_info(query, username):
             f"📌 Post: {profile.mediacount:,}"
         )
 
-        await query.message.reply_text(info_text)
+        await notify(query, info_text)
 
+    except CircuitOpenError as e:
+        await notify(query, circuit_open_text(e))
     except Exception as e:
         logger.error(f"Profile info error: {str(e)}")
-        await query.message.reply_text("⚠️ Gagal mengambil info profil")
+        await notify(query, "⚠️ Gagal mengambil info profil")
+
+# ========== PENYIMPANAN PELACAKAN ==========
+# Snapshot followers/following disimpan sebagai array userid (urutan dari API)
+# dalam file JSONL: satu baris "base" lalu baris "delta" (added/removed).
+TRACKING_DIR = os.getenv("TRACKING_DIR", "tracking_data")
+# Jumlah userid berurutan yang sama dengan snapshot lama sebelum scan dihentikan
+TRACK_STABLE_RUN = int(os.getenv("TRACK_STABLE_RUN", "50"))
+# Setiap N pelacakan dilakukan scan penuh untuk menangkap unfollow di bagian bawah
+TRACK_FULL_SCAN_EVERY = int(os.getenv("TRACK_FULL_SCAN_EVERY", "24"))
+# Jumlah delta maksimal sebelum file dipadatkan menjadi base baru
+TRACK_MAX_DELTAS = int(os.getenv("TRACK_MAX_DELTAS", "50"))
+
+def scan_follow_list(get_nodes, previous):
+    # Dijalankan di executor; get_nodes = profile.get_followers / get_followees
+    force_full = previous is None or previous["since_full"] + 1 >= TRACK_FULL_SCAN_EVERY
+    prev_order = previous["order"] if previous else array("q")
+    prev_pos = {} if force_full else {uid: i for i, uid in enumerate(prev_order)}
+
+    order = array("q")
+    names = {}
+    run = 0
+    last_pos = None
+    for node in get_nodes():
+        uid = node.userid
+        if uid in names:
+            continue
+        order.append(uid)
+        names[uid] = node.username
+
+        pos = prev_pos.get(uid)
+        if pos is None:
+            run = 0
+        elif last_pos is not None and pos == last_pos + 1:
+            run += 1
+        else:
+            run = 1
+        last_pos = pos
+
+        if run >= TRACK_STABLE_RUN:
+            # Sisa daftar dianggap sama dengan snapshot sebelumnya, paginasi dihentikan
+            for tail_uid in prev_order[pos + 1:]:
+                if tail_uid not in names:
+                    order.append(tail_uid)
+                    names[tail_uid] = previous["names"].get(tail_uid, str(tail_uid))
+            return {"order": order, "ids": array("q", sorted(order)), "names": names, "full": False}
+
+    return {"order": order, "ids": array("q", sorted(order)), "names": names, "full": True}
+
+def find_changes(previous, current):
+    # Merge dua array userid terurut, O(n)
+    old, new = previous["ids"], current["ids"]
+    added = set()
+    removed = []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            removed.append(old[i])
+            i += 1
+        else:
+            added.add(new[j])
+            j += 1
+    removed.extend(old[i:])
+    added.update(new[j:])
+    return {
+        "added": [uid for uid in current["order"] if uid in added],
+        "removed": removed
+    }
+
+def apply_changes(order, changes):
+    removed = set(changes["removed"])
+    return array("q", changes["added"] + [uid for uid in order if uid not in removed])
+
+class FollowStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, username, kind):
+        return os.path.join(self.directory, f"{username.lower()}_{kind}.jsonl")
+
+    def load(self, username, kind):
+        path = self._path(username, kind)
+        if not os.path.exists(path):
+            return None
+
+        snapshot = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                names = {int(uid): name for uid, name in record["names"].items()}
+                if record["type"] == "base":
+                    snapshot = {
+                        "order": array("q", record["order"]),
+                        "names": names,
+                        "since_full": record["since_full"],
+                        "deltas": 0
+                    }
+                elif snapshot is not None:
+                    snapshot["order"] = apply_changes(snapshot["order"], record)
+                    for uid in record["removed"]:
+                        snapshot["names"].pop(uid, None)
+                    snapshot["names"].update(names)
+                    snapshot["since_full"] = 0 if record["full"] else snapshot["since_full"] + 1
+                    snapshot["deltas"] += 1
+
+        if snapshot is None:
+            return None
+        snapshot["ids"] = array("q", sorted(snapshot["order"]))
+        return snapshot
+
+    def save(self, username, kind, previous, current, changes):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(username, kind)
+        since_full = 0 if current["full"] else (previous["since_full"] + 1 if previous else 0)
+
+        # Delta hanya dipakai jika replay-nya menghasilkan urutan yang sama persis
+        if (
+            previous is None
+            or previous["deltas"] >= TRACK_MAX_DELTAS
+            or apply_changes(previous["order"], changes) != current["order"]
+        ):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "type": "base",
+                    "ts": int(time.time()),
+                    "order": current["order"].tolist(),
+                    "names": current["names"],
+                    "since_full": since_full
+                }, f)
+                f.write("\n")
+            os.replace(tmp_path, path)
+            return
+
+        with open(path, "a", encoding="utf-8") as f:
+            json.dump({
+                "type": "delta",
+                "ts": int(time.time()),
+                "added": changes["added"],
+                "removed": changes["removed"],
+                "names": {uid: current["names"][uid] for uid in changes["added"]},
+                "full": current["full"]
+            }, f)
+            f.write("\n")
+
+follow_store = FollowStore(TRACKING_DIR)
+
+async def scan_and_diff(chat_id, profile, username, kind):
+    # Mengembalikan (snapshot lama, hasil scan, perubahan) lalu menyimpan hasilnya
+    get_nodes = profile.get_followers if kind == "followers" else profile.get_followees
+    previous = await run_blocking(chat_id, follow_store.load, username, kind)
+    current = await ig_call(
+        chat_id, lambda L: scan_follow_list(get_nodes, previous),
+        pin=profile._context, endpoint="follow_scan"
+    )
+    changes = find_changes(previous, current) if previous else {"added": [], "removed": []}
+    await run_blocking(chat_id, follow_store.save, username, kind, previous, current, changes)
+
+    added = [current["names"][uid] for uid in changes["added"]]
+    removed = [previous["names"].get(uid, str(uid)) for uid in changes["removed"]]
+    return previous, added, removed
 
 # ========== FUNGSI PELACAKAN BERKALA ==========
 async def periodic_tracking(context: ContextTypes.DEFAULT_TYPE):
     username = context.job.data.get("username")
     chat_id = context.job.data.get("chat_id")
+    token = work_class.set("background")
 
     try:
         # Lacak followers
@@ -569,25 +2351,21 @@ async def periodic_tracking(context: ContextTypes.DEFAULT_TYPE):
         await track_following_periodic(username, chat_id, context)
     except Exception as e:
         logger.error(f"Error in periodic tracking: {str(e)}", exc_info=True)
+    finally:
+        work_class.reset(token)
 
 async def track_followers_periodic(username, chat_id, context):
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await get_profile(chat_id, username)
 
         if profile.is_private and not profile.followed_by_viewer:
             await context.bot.send_message(chat_id, "🔒 Profil privat - Anda belum follow akun ini")
             return
 
-        # Ambil daftar followers saat ini
-        current_followers = [follower.username for follower in profile.get_followers()]
-
-        # Muat daftar followers sebelumnya
-        previous_followers = load_data(username, "followers")
+        # Scan daftar followers, bandingkan dengan snapshot lama lalu simpan
+        previous_followers, added, removed = await scan_and_diff(chat_id, profile, username, "followers")
 
         if previous_followers:
-            # Bandingkan daftar followers lama dan baru
-            added, removed = find_changes(previous_followers, current_followers)
-
             # Kirim notifikasi perubahan
             if added or removed:
                 message = "📊 Perubahan Followers:\n"
@@ -603,31 +2381,22 @@ async def track_followers_periodic(username, chat_id, context):
         else:
             await context.bot.send_message(chat_id, "📊 Ini adalah pelacakan pertama. Data followers telah disimpan.")
 
-        # Simpan daftar followers terbaru
-        save_data(username, current_followers, "followers")
-
     except Exception as e:
         logger.error(f"Error tracking followers: {str(e)}", exc_info=True)
         await context.bot.send_message(chat_id, "⚠️ Gagal melacak followers")
 
 async def track_following_periodic(username, chat_id, context):
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await get_profile(chat_id, username)
 
         if profile.is_private and not profile.followed_by_viewer:
             await context.bot.send_message(chat_id, "🔒 Profil privat - Anda belum follow akun ini")
             return
 
-        # Ambil daftar following saat ini
-        current_following = [followed.username for followed in profile.get_followees()]
-
-        # Muat daftar following sebelumnya
-        previous_following = load_data(username, "following")
+        # Scan daftar following, bandingkan dengan snapshot lama lalu simpan
+        previous_following, added, removed = await scan_and_diff(chat_id, profile, username, "following")
 
         if previous_following:
-            # Bandingkan daftar following lama dan baru
-            added, removed = find_changes(previous_following, current_following)
-
             # Kirim notifikasi perubahan
             if added or removed:
                 message = "📊 Perubahan Following:\n"
@@ -643,9 +2412,6 @@ async def track_following_periodic(username, chat_id, context):
         else:
             await context.bot.send_message(chat_id, "📊 Ini adalah pelacakan pertama. Data following telah disimpan.")
 
-        # Simpan daftar following terbaru
-        save_data(username, current_following, "following")
-
     except Exception as e:
         logger.error(f"Error tracking following: {str(e)}", exc_info=True)
         await context.bot.send_message(chat_id, "⚠️ Gagal melacak following")
@@ -695,9 +2461,52 @@ async def stop_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     else:
         await update.message.reply_text("❌ Tidak ada pelacakan aktif untuk akun ini.")
         
+# ========== STATUS ==========
+def collect_status():
+    return [
+        "👥 Akun Instagram",
+        *account_pool.stats(),
+        "🔌 Circuit breaker",
+        *[breaker.stats() for breaker in breakers.values()],
+        "🚦 Antrean worker",
+        *work_scheduler.stats(),
+        "⏱️ Rate limiter",
+        f"• {cdn_limiter.stats()}",
+        "📨 Dispatcher Telegram",
+        *dispatcher.stats(),
+        "🗃️ Cache",
+        f"• {profile_cache.stats()}",
+        f"• {highlight_cache.stats()}",
+        f"• {file_id_cache.stats()}",
+        cdn_client.stats(),
+        singleflight.stats(),
+        job_registry.stats(),
+        admission.stats(),
+        f"📦 Buffer prefetch: {media_budget.used / (1024 * 1024):.1f}/{media_budget.limit / (1024 * 1024):.0f} MB, "
+        f"sedang diunduh {media_budget.inflight / (1024 * 1024):.1f} MB",
+    ]
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text("\n".join(collect_status()))
+
 # ========== MAIN PROGRAM ==========
+async def post_init(application: Application) -> None:
+    elapsed = time.monotonic() - STARTUP_STARTED
+    if elapsed > STARTUP_BUDGET:
+        logger.warning(f"🐢 Startup {elapsed:.2f} detik, melebihi budget {STARTUP_BUDGET} detik")
+    else:
+        logger.info(f"🚀 Startup {elapsed:.2f} detik")
+    # Verifikasi login tidak menahan polling
+    application.bot_data['account_check'] = asyncio.create_task(validate_accounts())
+
 def main():
-    application = Application.builder().token(env_vars['TOKEN_BOT']).build()
+    application = (
+        Application.builder()
+        .token(env_vars['TOKEN_BOT'])
+        .post_init(post_init)
+        .concurrent_updates(PerChatUpdateProcessor())
+        .build()
+    )
 
     # Tambah handler
     application.add_handler(CommandHandler("start", start))
@@ -705,9 +2514,16 @@ def main():
     application.add_handler(CallbackQueryHandler(button_handler))
     application.add_handler(CommandHandler("start_tracking", start_tracking))
     application.add_handler(CommandHandler("stop_tracking", stop_tracking))
+    application.add_handler(CommandHandler("status", status_command))
 
-    logger.info("🤖 Bot started successfully")
-    application.run_polling()
+    logger.info(f"🤖 Bot started successfully ({IG_WORKERS} worker Instagram)")
+    try:
+        run_application(application)
+    finally:
+        file_id_cache.flush()
+        for account in account_pool.accounts:
+            account.save_session()
+        executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,7 @@
 import logging
 import os
 import time
-import csv
-from pathlib import Path
+import shlex
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -18,6 +17,7 @@ from telegram.ext import (
     ContextTypes,
     TypeHandler
 )
+from airdrop_storage import AIRDROP_TYPES, LINK_COLUMNS, CsvStorage, SqliteStorage
 
 # ... [Bagian yang sama sampai ke CSV_FILE] ...
 
@@ -28,18 +28,176 @@ CSV_COLUMNS = ['Nama', 'Twitter', 'Discord', 'Telegram', 'Link', 'Type', 'Deadli
 # States baru
 NAMA, TWITTER, DISCORD, TELEGRAM, LINK, TYPE, DEADLINE = range(7)
 
-# ... [Bagian yang sama sampai ke init_csv] ...
+# ... [Bagian yang sama sampai ke CSV Functions] ...
 
-def init_csv():
-    if not Path(CSV_FILE).exists():
-        with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(CSV_COLUMNS)
+# ========== STORAGE ==========
+# Backend dipakai bersama dengan edit.py (airdrop_storage.py); di sini hanya
+# ditambah kolom Deadline dan turunannya deadline_at untuk filter & pengurutan
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+DB_FILE = os.getenv('DB_FILE', 'airdropbot.db')
+DEADLINE_FORMAT = "%d-%m-%Y %H:%M"
 
-def append_to_csv(data):
-    with open(CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(data)
+def deadline_key(value):
+    # Deadline disimpan juga dalam format ISO agar bisa diurutkan & di-index
+    try:
+        return datetime.strptime(value, DEADLINE_FORMAT).strftime("%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return None
+
+# Filter /list, contoh: /list type:Testnet deadline<7d has:discord sort:deadline limit:20
+SORT_COLUMNS = {'id': None, 'nama': 'Nama', 'type': 'Type', 'deadline': 'deadline_at'}
+DURATION_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+def parse_duration(value):
+    # "7d" -> timedelta(days=7); satuan h (jam), d (hari), w (minggu)
+    number, unit = value[:-1], value[-1:].lower()
+    if not number.isdigit() or unit not in DURATION_UNITS:
+        raise ValueError(f"Durasi '{value}' tidak valid, contoh: 12h, 7d, 2w")
+    return timedelta(**{DURATION_UNITS[unit]: int(number)})
+
+def parse_list_query(text):
+    filters = {'type': None, 'has': [], 'deadline_before': None, 'deadline_after': None, 'sort': 'id', 'limit': None}
+    for token in shlex.split(text):
+        lowered = token.lower()
+        if lowered.startswith('deadline<'):
+            filters['deadline_before'] = parse_duration(token[len('deadline<'):])
+            continue
+        if lowered.startswith('deadline>'):
+            filters['deadline_after'] = parse_duration(token[len('deadline>'):])
+            continue
+        key, _, value = token.partition(':')
+        key, value = key.lower(), value.strip()
+        if key == 'type' and value:
+            # Samakan dengan nama type baku agar cocok dengan index
+            filters['type'] = next((t for t in AIRDROP_TYPES if t.lower() == value.lower()), value)
+        elif key == 'has' and value.lower() in LINK_COLUMNS:
+            filters['has'].append(LINK_COLUMNS[value.lower()])
+        elif key == 'sort' and value.lower() in SORT_COLUMNS:
+            filters['sort'] = value.lower()
+        elif key == 'limit' and value.isdigit() and int(value) > 0:
+            filters['limit'] = int(value)
+        else:
+            raise ValueError(f"Filter '{token}' tidak dikenal")
+    return filters
+
+class AirdropCsvStorage(CsvStorage):
+    columns = CSV_COLUMNS
+    sort_columns = SORT_COLUMNS
+
+    # Dipakai job terjadwal; dihitung dari cache di memori, tanpa baca file
+    def count_with_deadline(self):
+        return sum(1 for record in self._load() if deadline_key(record['Deadline']))
+
+    def deadlines_between(self, start, end):
+        start_key, end_key = start.strftime("%Y-%m-%d %H:%M"), end.strftime("%Y-%m-%d %H:%M")
+        matches = []
+        for record_id, record in enumerate(self._load(), 1):
+            key = deadline_key(record['Deadline'])
+            if key and start_key < key < end_key:
+                matches.append((key, record_id, record))
+        matches.sort()
+        return [(record_id, record) for _, record_id, record in matches]
+
+    def query(self, filters):
+        # Filter type/has lewat FilterIndex, lalu filter & urutan deadline di
+        # atas hasilnya (record CSV tidak punya kolom deadline_at)
+        records = self._load()
+        ids = (self._position(row_id) for row_id in self._filters.select(filters))
+        matches = [(record_id, records[record_id - 1]) for record_id in ids]
+        now = datetime.now()
+        now_key = now.strftime("%Y-%m-%d %H:%M")
+        if filters['deadline_before'] is not None:
+            end_key = (now + filters['deadline_before']).strftime("%Y-%m-%d %H:%M")
+            matches = [
+                (record_id, record) for record_id, record in matches
+                if now_key < (deadline_key(record['Deadline']) or '') < end_key
+            ]
+        if filters['deadline_after'] is not None:
+            start_key = (now + filters['deadline_after']).strftime("%Y-%m-%d %H:%M")
+            matches = [
+                (record_id, record) for record_id, record in matches
+                if (deadline_key(record['Deadline']) or '') > start_key
+            ]
+        sort_col = self.sort_columns[filters['sort']]
+        if sort_col == 'deadline_at':
+            matches.sort(key=lambda r: (deadline_key(r[1]['Deadline']) is None, deadline_key(r[1]['Deadline']) or '', r[0]))
+        elif sort_col:
+            matches.sort(key=lambda r: (r[1][sort_col].lower(), r[0]))
+        return matches[:filters['limit']]
+
+class AirdropSqliteStorage(SqliteStorage):
+    # deadline_at diisi ulang oleh _values() di setiap add/update/import,
+    # jadi index-nya selalu sinkron dengan kolom Deadline
+    columns = CSV_COLUMNS
+    sort_columns = SORT_COLUMNS
+    derived_columns = ('deadline_at',)
+
+    def init(self):
+        super().init()
+        with self.conn:
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_airdrops_deadline ON airdrops (deadline_at)")
+
+    def _values(self, record):
+        return super()._values(record) + [deadline_key(record['Deadline'])]
+
+    def query(self, filters):
+        where, params = [], []
+        now = datetime.now()
+        if filters['type'] is not None:
+            where.append("Type = ?")
+            params.append(filters['type'])
+        if filters['deadline_before'] is not None:
+            # Hanya deadline yang belum lewat, range scan di idx_airdrops_deadline
+            where.append("deadline_at > ? AND deadline_at < ?")
+            params += [now.strftime("%Y-%m-%d %H:%M"), (now + filters['deadline_before']).strftime("%Y-%m-%d %H:%M")]
+        if filters['deadline_after'] is not None:
+            where.append("deadline_at > ?")
+            params.append((now + filters['deadline_after']).strftime("%Y-%m-%d %H:%M"))
+        for col in filters['has']:
+            # Harus sama persis dengan predikat partial index agar index dipakai
+            where.append(f"{col} NOT IN ('', '-')")
+        sort_col = self.sort_columns[filters['sort']]
+        sql = "SELECT * FROM airdrops"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if sort_col == 'deadline_at':
+            sql += " ORDER BY deadline_at IS NULL, deadline_at, id"
+        elif sort_col:
+            sql += f" ORDER BY {sort_col} COLLATE NOCASE, id"
+        else:
+            sql += " ORDER BY id"
+        if filters['limit']:
+            sql += " LIMIT ?"
+            params.append(filters['limit'])
+        rows = self.conn.execute(sql, params)
+        return [(row['id'], self._record(row)) for row in rows]
+
+    def count_with_deadline(self):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM airdrops WHERE deadline_at IS NOT NULL"
+        ).fetchone()[0]
+
+    def deadlines_between(self, start, end):
+        # Range scan lewat idx_airdrops_deadline, bukan parsing seluruh tabel
+        rows = self.conn.execute(
+            "SELECT * FROM airdrops WHERE deadline_at > ? AND deadline_at < ? ORDER BY deadline_at",
+            (start.strftime("%Y-%m-%d %H:%M"), end.strftime("%Y-%m-%d %H:%M"))
+        )
+        return [(row['id'], self._record(row)) for row in rows]
+
+def create_storage():
+    if STORAGE_BACKEND == 'csv':
+        return AirdropCsvStorage(CSV_FILE)
+    return AirdropSqliteStorage(DB_FILE)
+
+storage = create_storage()
+
+def init_storage():
+    storage.init()
+    if isinstance(storage, SqliteStorage):
+        imported = storage.import_csv(CSV_FILE)
+        if imported:
+            logger.info(f"📥 {imported} record diimpor dari {CSV_FILE} ke {DB_FILE}")
 
 # ... [Bagian yang sama sampai ke get_link] ...
 
@@ -92,8 +250,8 @@ async def save_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Parse deadline
     if user_input != 'Skip':
         try:
-            deadline = datetime.strptime(user_input, "%d-%m-%Y %H:%M")
-            context.user_data['deadline'] = deadline.strftime("%d-%m-%Y %H:%M")
+            deadline = datetime.strptime(user_input, DEADLINE_FORMAT)
+            context.user_data['deadline'] = deadline.strftime(DEADLINE_FORMAT)
         except ValueError:
             await update.message.reply_text(
                 "❌ Format deadline salah! Gunakan DD-MM-YYYY HH:mm atau Skip"
@@ -103,19 +261,19 @@ async def save_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['deadline'] = '-'
     
     try:
-        row = [
-            context.user_data['nama'],
-            context.user_data['twitter'],
-            context.user_data['discord'],
-            context.user_data['telegram'],
-            context.user_data['link'],
-            context.user_data['type'],
-            context.user_data['deadline']
-        ]
-        append_to_csv(row)
+        record = {
+            'Nama': context.user_data['nama'],
+            'Twitter': context.user_data['twitter'],
+            'Discord': context.user_data['discord'],
+            'Telegram': context.user_data['telegram'],
+            'Link': context.user_data['link'],
+            'Type': context.user_data['type'],
+            'Deadline': context.user_data['deadline']
+        }
+        storage.add(record)
         await update.message.reply_text('✅ Data berhasil disimpan!')
     except Exception as e:
-        logger.exception("Error saving to CSV:")
+        logger.exception("Error saving record:")
         await update.message.reply_text('🔥 Error sistem! Hubungi admin')
     
     return ConversationHandler.END
@@ -123,48 +281,39 @@ async def save_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Fungsi reminder
 async def check_deadlines(context: ContextTypes.DEFAULT_TYPE):
     now = datetime.now()
-    records = read_csv()
     
-    for record in records:
-        if record['Deadline'] != '-':
-            try:
-                deadline = datetime.strptime(record['Deadline'], "%d-%m-%Y %H:%M")
-                time_diff = deadline - now
-                
-                if timedelta(0) < time_diff < timedelta(hours=24):
-                    message = (
-                        f"⏳ DEADLINE MENDEKAT!\n\n"
-                        f"📛 {record['Nama']}\n"
-                        f"🔗 {record['Link']}\n"
-                        f"⏰ Tersisa {time_diff.seconds//3600} jam"
-                    )
-                    await context.bot.send_message(
-                        chat_id=context.job.chat_id,
-                        text=message
-                    )
-            except:
-                continue
+    for _, record in storage.deadlines_between(now, now + timedelta(hours=24)):
+        try:
+            deadline = datetime.strptime(record['Deadline'], DEADLINE_FORMAT)
+            time_diff = deadline - now
+            message = (
+                f"⏳ DEADLINE MENDEKAT!\n\n"
+                f"📛 {record['Nama']}\n"
+                f"🔗 {record['Link']}\n"
+                f"⏰ Tersisa {time_diff.seconds//3600} jam"
+            )
+            await context.bot.send_message(
+                chat_id=context.job.chat_id,
+                text=message
+            )
+        except:
+            continue
 
 async def periodic_reminder(context: ContextTypes.DEFAULT_TYPE):
-    records = read_csv()
     await context.bot.send_message(
         chat_id=context.job.chat_id,
-        text=f"📌 Periodic Reminder!\nTotal Airdrop Aktif: {len(records)}"
+        text=f"📌 Periodic Reminder!\nTotal Airdrop Aktif: {storage.count()}"
     )
 
 async def daily_summary(context: ContextTypes.DEFAULT_TYPE):
-    records = read_csv()
-    upcoming = sum(1 for r in records if r['Deadline'] != '-')
+    upcoming = storage.count_with_deadline()
     await context.bot.send_message(
         chat_id=context.job.chat_id,
-        text=f"📊 Laporan Harian\n• Total: {len(records)}\n• Deadline Mendatang: {upcoming}"
+        text=f"📊 Laporan Harian\n• Total: {storage.count()}\n• Deadline Mendatang: {upcoming}"
     )
 
 async def weekly_summary(context: ContextTypes.DEFAULT_TYPE):
-    records = read_csv()
-    weekly_stats = {}
-    for r in records:
-        weekly_stats[r['Type']] = weekly_stats.get(r['Type'], 0) + 1
+    weekly_stats = storage.count_by_type()
     
     stats_text = "\n".join([f"• {k}: {v}" for k,v in weekly_stats.items()])
     await context.bot.send_message(
@@ -195,7 +344,7 @@ async def set_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # Di main() tambahkan scheduler
 def main():
-    init_csv()
+    init_storage()
     application = Application.builder().token(TOKEN).build()
     scheduler = AsyncIOScheduler()
     scheduler.start()
@@ -221,4 +370,7 @@ def main():
     
     # ... [Bagian lainnya tetap sama] ...
 
-    application.run_polling()
+    try:
+        application.run_polling()
+    finally:
+        storage.close()
@@ -1,11 +1,17 @@
+import time
+
+# Dipakai untuk mengukur waktu startup sampai bot siap menerima update; diambil
+# sebelum import telegram/instaloader agar waktu import ikut terhitung
+STARTUP_STARTED = time.monotonic()
+
 import logging
 import re
 import os
-import time
 import random
 import json
+import asyncio
 import requests
-import glob
+import tempfile
 import shutil
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -16,8 +22,10 @@ from telegram.ext import (
     filters,
     CallbackQueryHandler
 )
+from bot_runner import PerChatUpdateProcessor, run_application
 import instaloader
 from instaloader import Instaloader, Profile, QueryReturnedBadRequestException
+from instaloader.exceptions import LoginRequiredException
 from dotenv import load_dotenv
 from requests.cookies import RequestsCookieJar
 
@@ -80,7 +88,22 @@ loader = Instaloader(
     compress_json=False, download_comments=False
 )
 
-try:
+# Session disimpan ke file agar restart tidak perlu membangun dan memverifikasi ulang
+SESSION_FILE = os.getenv("INSTAGRAM_SESSION_FILE", f"session-{env_vars['INSTAGRAM_USERNAME']}")
+# Target waktu dari start proses sampai bot siap menerima update (detik)
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "1.0"))
+
+def load_session():
+    # Pakai session tersimpan (tanpa request jaringan) selama sessionid-nya sama dengan .env
+    if os.path.exists(SESSION_FILE):
+        try:
+            loader.load_session_from_file(env_vars['INSTAGRAM_USERNAME'], SESSION_FILE)
+            if loader.context._session.cookies.get("sessionid") == env_vars['INSTAGRAM_SESSIONID']:
+                logger.info(f"📂 Session dimuat dari {SESSION_FILE}")
+                return
+        except Exception as e:
+            logger.warning(f"⚠️ Session file tidak bisa dipakai: {str(e)}")
+
     # Buat cookie jar
     cookie_jar = RequestsCookieJar()
     cookies = {
@@ -97,15 +120,69 @@ try:
 
     loader.context._session.cookies = cookie_jar
     loader.context.username = env_vars['INSTAGRAM_USERNAME']
+    loader.save_session_to_file(SESSION_FILE)
 
-    # Verifikasi session
-    test_profile = Profile.from_username(loader.context, env_vars['INSTAGRAM_USERNAME'])
-    logger.info(f"✅ Login berhasil sebagai: {test_profile.full_name}")
-
+try:
+    load_session()
 except Exception as e:
-    logger.error(f"❌ Gagal login: {str(e)}")
+    logger.error(f"❌ Gagal menyiapkan session: {str(e)}")
     exit(1)
 
+async def validate_session():
+    # Verifikasi session di background setelah bot mulai polling
+    try:
+        loop = asyncio.get_running_loop()
+        test_profile = await loop.run_in_executor(
+            None, Profile.from_username, loader.context, env_vars['INSTAGRAM_USERNAME']
+        )
+        logger.info(f"✅ Login berhasil sebagai: {test_profile.full_name}")
+    except Exception as e:
+        logger.error(f"❌ Gagal login: {str(e)}")
+        # Session tersimpan hanya dibuang jika memang tidak berlaku lagi, bukan
+        # karena error jaringan/429, agar start berikutnya membangun ulang dari .env
+        if is_session_invalid(e) and os.path.exists(SESSION_FILE):
+            os.remove(SESSION_FILE)
+
+def is_session_invalid(error):
+    if isinstance(error, LoginRequiredException):
+        return True
+    text = str(error).lower()
+    return any(word in text for word in ("checkpoint", "challenge", "login_required"))
+
+# Handler berjalan bersamaan (concurrent_updates), jadi panggilan Instaloader dan
+# unduhan dijalankan di thread lain agar event loop tetap melayani chat lain.
+# Loader dan session-nya dipakai bersama, sehingga panggilannya tetap satu per satu.
+ig_lock = asyncio.Lock()
+
+async def ig_run(func, *args, **kwargs):
+    async with ig_lock:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+def fetch_story_items(userid):
+    items = []
+    for story in loader.get_stories([userid]):
+        items.extend(story.get_items())
+    return items
+
+def download_item(item, temp_dir):
+    # Tiap item diunduh ke subdirektori baru, jadi file di dalamnya pasti milik
+    # item ini; mengembalikan path media yang sesuai tipenya atau None
+    item_dir = tempfile.mkdtemp(dir=temp_dir)
+    if not loader.download_storyitem(item, item_dir):
+        return None
+    expected_ext = ('.mp4', '.mov') if item.is_video else ('.jpg', '.jpeg', '.png')
+    for name in os.listdir(item_dir):
+        if name.lower().endswith(expected_ext):
+            return os.path.join(item_dir, name)
+    return None
+
+def download_file(url, path):
+    response = requests.get(url, headers=get_random_headers(), stream=True)
+    response.raise_for_status()
+    with open(path, "wb") as f:
+        for chunk in response.iter_content(chunk_size=8192):
+            f.write(chunk)
+
 # ========== BOT HANDLERS ==========
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
@@ -190,24 +267,20 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def handle_profile_pic(query, username):
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await ig_run(Profile.from_username, loader.context, username)
 
         if profile.is_private and not profile.followed_by_viewer:
             await query.message.reply_text("🔒 Profil privat - Anda belum follow akun ini")
             return
 
         # Dapatkan URL HD
-        hd_url = profile.profile_pic_url.replace("/s150x150/", "/s1080x1080/")
-
-        # Download gambar
-        response = requests.get(hd_url, headers=get_random_headers(), stream=True)
-        response.raise_for_status()
+        pic_url = await ig_run(lambda: profile.profile_pic_url)
+        hd_url = pic_url.replace("/s150x150/", "/s1080x1080/")
 
-        # Simpan sementara
-        temp_file = f"temp_{username}_{int(time.time())}.jpg"
-        with open(temp_file, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        # Download gambar ke file sementara
+        fd, temp_file = tempfile.mkstemp(prefix=f"temp_{username}_", suffix=".jpg", dir=".")
+        os.close(fd)
+        await asyncio.to_thread(download_file, hd_url, temp_file)
 
         # Kirim sebagai dokumen
         await query.message.reply_document(
@@ -224,16 +297,14 @@ async def handle_profile_pic(query, username):
 # --- MODIFIED handle_stories ---
 async def handle_stories(query, username):
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await ig_run(Profile.from_username, loader.context, username)
 
         if profile.is_private and not profile.followed_by_viewer:
             await query.message.reply_text("🔒 Profil privat - Anda belum follow akun ini")
             return
 
-        stories = []
         try:
-            for story in loader.get_stories([profile.userid]):
-                stories.extend(story.get_items())
+            stories = await ig_run(fetch_story_items, profile.userid)
         except QueryReturnedBadRequestException:
             await query.message.reply_text("🔒 Profil privat - Bot tidak dapat mengakses story")
             return
@@ -244,8 +315,8 @@ async def handle_stories(query, username):
             await query.message.reply_text("📭 Tidak ada story yang tersedia")
             return
 
-        temp_dir = f"temp_{username}_{int(time.time())}"
-        os.makedirs(temp_dir, exist_ok=True)
+        # Direktori unik per permintaan: chat lain bisa meminta profil yang sama bersamaan
+        temp_dir = tempfile.mkdtemp(prefix=f"temp_{username}_", dir=".")
 
         try:
             sent_count = 0
@@ -253,31 +324,11 @@ async def handle_stories(query, username):
 
             for story_item in stories:
                 try:
-                    download_success = loader.download_storyitem(story_item, temp_dir)
-                    if not download_success:
+                    latest_file = await ig_run(download_item, story_item, temp_dir)
+                    if latest_file is None:
                         logger.warning(f"Gagal mengunduh story item: {story_item.mediaid}")
                         continue
-
-                    # Filter file media valid
-                    valid_extensions = ('.jpg', '.jpeg', '.png', '.mp4', '.mov')
-                    media_files = [
-                        f for f in glob.glob(os.path.join(temp_dir, "*"))
-                        if f.lower().endswith(valid_extensions)
-                    ]
-
-                    if not media_files:
-                        logger.warning("Tidak ada file media yang valid")
-                        continue
-
-                    # Ambil file terbaru
-                    latest_file = max(media_files, key=os.path.getmtime)
-
-                    # Validasi tipe file
                     is_video = story_item.is_video
-                    expected_ext = ('.mp4', '.mov') if is_video else ('.jpg', '.jpeg', '.png')
-                    if not latest_file.lower().endswith(expected_ext):
-                        logger.error("Ekstensi file tidak sesuai dengan tipe konten")
-                        continue
 
                     # Cek ukuran file
                     file_size = os.path.getsize(latest_file)
@@ -308,7 +359,7 @@ async def handle_stories(query, username):
                         if os.path.exists(latest_file):
                             os.remove(latest_file)
 
-                    time.sleep(2)
+                    await asyncio.sleep(2)
 
                 except Exception as e:
                     logger.error(f"Gagal mengunduh atau mengirim story: {str(e)}")
@@ -331,8 +382,8 @@ async def handle_stories(query, username):
 # --- (Tidak berubah) ---
 async def handle_highlights(query, username):
     try:
-        profile = Profile.from_username(loader.context, username)
-        highlights = list(loader.get_highlights(user=profile))
+        profile = await ig_run(Profile.from_username, loader.context, username)
+        highlights = await ig_run(lambda: list(loader.get_highlights(user=profile)))
 
         if not highlights:
             await query.message.reply_text("🌟 Tidak ada highlights yang tersedia")
@@ -366,8 +417,8 @@ async def handle_highlights(query, username):
 async def handle_highlight_items(query, username, highlight_id):
     temp_dir = None  # Inisialisasi variabel di scope terluar
     try:
-        profile = Profile.from_username(loader.context, username)
-        highlights = list(loader.get_highlights(user=profile))
+        profile = await ig_run(Profile.from_username, loader.context, username)
+        highlights = await ig_run(lambda: list(loader.get_highlights(user=profile)))
 
         # Konversi highlight_id ke integer
         highlight_id_int = int(highlight_id)
@@ -384,36 +435,21 @@ async def handle_highlight_items(query, username, highlight_id):
             return
 
         # Buat direktori temporary
-        temp_dir = f"temp_highlight_{username}_{int(time.time())}"
-        os.makedirs(temp_dir, exist_ok=True)
+        # Direktori unik per permintaan: chat lain bisa meminta highlight yang sama bersamaan
+        temp_dir = tempfile.mkdtemp(prefix=f"temp_highlight_{username}_", dir=".")
         sent_count = 0
 
         try:
-            for item in highlight.get_items():
+            items = await ig_run(lambda: list(highlight.get_items()))
+            for item in items:
                 # Download item
-                loader.download_storyitem(item, target=temp_dir)
-                time.sleep(3)
-
-                # Filter file media valid
-                valid_extensions = ('.jpg', '.jpeg', '.png', '.mp4', '.mov')
-                media_files = [
-                    f for f in glob.glob(os.path.join(temp_dir, "*"))
-                    if f.lower().endswith(valid_extensions)
-                ]
+                latest_file = await ig_run(download_item, item, temp_dir)
+                await asyncio.sleep(3)
 
-                if not media_files:
+                if latest_file is None:
                     logger.warning("Tidak ada file media yang valid")
                     continue
-
-                # Ambil file terbaru
-                latest_file = max(media_files, key=os.path.getmtime)
-
-                # Validasi tipe file
                 is_video = item.is_video
-                expected_ext = ('.mp4', '.mov') if is_video else ('.jpg', '.jpeg', '.png')
-                if not latest_file.lower().endswith(expected_ext):
-                    logger.error("Ekstensi file tidak sesuai dengan tipe konten")
-                    continue
 
                 # Cek ukuran file
                 file_size = os.path.getsize(latest_file)
@@ -444,7 +480,7 @@ async def handle_highlight_items(query, username, highlight_id):
                     if os.path.exists(latest_file):
                         os.remove(latest_file)
 
-                time.sleep(1)
+                await asyncio.sleep(1)
 
             await query.message.reply_text(f"✅ {sent_count} item dari highlight '{highlight.title}' berhasil dikirim")
 
@@ -470,7 +506,7 @@ async def handle_highlight_items(query, username, highlight_id):
 # --- (Tidak berubah) ---
 async def handle_profile_info(query, username):
     try:
-        profile = Profile.from_username(loader.context, username)
+        profile = await ig_run(Profile.from_username, loader.context, username)
 
         info_text = (
             f"📊 Info Profil @{username}:\n"
@@ -487,8 +523,23 @@ async def handle_profile_info(query, username):
         logger.error(f"Profile info error: {str(e)}")
         await query.message.reply_text("⚠️ Gagal mengambil info profil")
 
+async def post_init(application: Application) -> None:
+    elapsed = time.monotonic() - STARTUP_STARTED
+    if elapsed > STARTUP_BUDGET:
+        logger.warning(f"🐢 Startup {elapsed:.2f} detik, melebihi budget {STARTUP_BUDGET} detik")
+    else:
+        logger.info(f"🚀 Startup {elapsed:.2f} detik")
+    # Verifikasi login tidak menahan polling
+    application.bot_data['session_check'] = asyncio.create_task(validate_session())
+
 def main():
-    application = Application.builder().token(env_vars['TOKEN_BOT']).build()
+    application = (
+        Application.builder()
+        .token(env_vars['TOKEN_BOT'])
+        .post_init(post_init)
+        .concurrent_updates(PerChatUpdateProcessor())
+        .build()
+    )
 
     # Tambah handler
     application.add_handler(CommandHandler("start", start))
@@ -496,7 +547,7 @@ def main():
     application.add_handler(CallbackQueryHandler(button_handler))
 
     logger.info("🤖 Bot started successfully")
-    application.run_polling()
+    run_application(application)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file